@@ -2,11 +2,12 @@
 Admin SQL Chat - Test Mode (No Database Required)
 Allows testing SQL generation and chat functionality without live database connection
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 from fastapi.responses import JSONResponse
 from typing import Optional, Dict, Any, List
-import uuid
+from secrets import token_urlsafe
 from pydantic import BaseModel
+import re
 
 from app.services.sql_generator import sql_generator
 from app.services.visualization_service import visualization_service
@@ -73,46 +74,59 @@ MOCK_SCHEMA = {
 }
 
 
+# Single-pass dispatch for mock data: one scan of the SQL collects every
+# keyword hit, then the first match in priority order (same order as the
+# old if/elif ladder) picks the canned result set
+_MOCK_DISPATCH_RE = re.compile(
+    r"(?P<users>users)|(?P<enrollments>enrollments)|(?P<claims>claims)|"
+    r"(?P<count>count)|(?P<total>sum|total)",
+    re.IGNORECASE
+)
+
+_MOCK_PRIORITY = ("users", "enrollments", "claims", "count", "total")
+
+_MOCK_RESULTS: Dict[str, tuple] = {
+    "users": (
+        {"id": 1, "name": "John Doe", "email": "john@example.com", "created_at": "2024-01-15", "branch_id": "kano"},
+        {"id": 2, "name": "Jane Smith", "email": "jane@example.com", "created_at": "2024-02-20", "branch_id": "rivers"},
+        {"id": 3, "name": "Bob Johnson", "email": "bob@example.com", "created_at": "2024-03-10", "branch_id": "kaduna"},
+    ),
+    "enrollments": (
+        {"id": 1, "user_id": 1, "plan_type": "premium", "status": "active", "enrolled_at": "2024-01-20"},
+        {"id": 2, "user_id": 2, "plan_type": "standard", "status": "active", "enrolled_at": "2024-02-25"},
+        {"id": 3, "user_id": 3, "plan_type": "premium", "status": "pending", "enrolled_at": "2024-03-15"},
+    ),
+    "claims": (
+        {"id": 1, "enrollment_id": 1, "amount": 5000.00, "status": "approved", "submitted_at": "2024-04-01"},
+        {"id": 2, "enrollment_id": 2, "amount": 3000.00, "status": "pending", "submitted_at": "2024-04-05"},
+        {"id": 3, "enrollment_id": 1, "amount": 7500.00, "status": "approved", "submitted_at": "2024-04-10"},
+    ),
+    "count": ({"count": 150},),
+    "total": ({"total": 15500.00},),
+}
+
+_MOCK_DEFAULT = (
+    {"id": 1, "value": "Sample Data 1"},
+    {"id": 2, "value": "Sample Data 2"},
+)
+
+
 def generate_mock_data(sql: str) -> List[Dict[str, Any]]:
     """
     Generate mock data based on SQL query
     This simulates database results for testing
     """
-    sql_lower = sql.lower()
-    
-    # Simple mock data generation based on query
-    if "users" in sql_lower:
-        return [
-            {"id": 1, "name": "John Doe", "email": "john@example.com", "created_at": "2024-01-15", "branch_id": "kano"},
-            {"id": 2, "name": "Jane Smith", "email": "jane@example.com", "created_at": "2024-02-20", "branch_id": "rivers"},
-            {"id": 3, "name": "Bob Johnson", "email": "bob@example.com", "created_at": "2024-03-10", "branch_id": "kaduna"},
-        ]
-    elif "enrollments" in sql_lower:
-        return [
-            {"id": 1, "user_id": 1, "plan_type": "premium", "status": "active", "enrolled_at": "2024-01-20"},
-            {"id": 2, "user_id": 2, "plan_type": "standard", "status": "active", "enrolled_at": "2024-02-25"},
-            {"id": 3, "user_id": 3, "plan_type": "premium", "status": "pending", "enrolled_at": "2024-03-15"},
-        ]
-    elif "claims" in sql_lower:
-        return [
-            {"id": 1, "enrollment_id": 1, "amount": 5000.00, "status": "approved", "submitted_at": "2024-04-01"},
-            {"id": 2, "enrollment_id": 2, "amount": 3000.00, "status": "pending", "submitted_at": "2024-04-05"},
-            {"id": 3, "enrollment_id": 1, "amount": 7500.00, "status": "approved", "submitted_at": "2024-04-10"},
-        ]
-    elif "count" in sql_lower:
-        return [{"count": 150}]
-    elif "sum" in sql_lower or "total" in sql_lower:
-        return [{"total": 15500.00}]
-    else:
-        # Generic mock data
-        return [
-            {"id": 1, "value": "Sample Data 1"},
-            {"id": 2, "value": "Sample Data 2"},
-        ]
+    hits = {m.lastgroup for m in _MOCK_DISPATCH_RE.finditer(sql)}
+    for name in _MOCK_PRIORITY:
+        if name in hits:
+            # Shallow-copy the outer list; callers may append/slice results
+            return list(_MOCK_RESULTS[name])
+    # Generic mock data
+    return list(_MOCK_DEFAULT)
 
 
 @router.post("/admin/test/query", response_model=AdminQueryResponse)
-async def admin_query_test(request: AdminQueryRequest):
+async def admin_query_test(request: AdminQueryRequest, background_tasks: BackgroundTasks):
     """
     Admin Insights Test Mode: Query SQL generation without database connection
     
@@ -127,7 +141,7 @@ async def admin_query_test(request: AdminQueryRequest):
     """
     try:
         # Get or create session ID
-        session_id = request.session_id or str(uuid.uuid4())
+        session_id = request.session_id or token_urlsafe(16)
         
         # Get conversation history if refining query
         conversation_history = None
@@ -138,59 +152,19 @@ async def admin_query_test(request: AdminQueryRequest):
             )
         
         # Step 1: Generate SQL from natural language
-        # Mock the schema context since database_service won't be available
+        # Inject the mock schema directly; no database lookup, no
+        # monkey-patching of module globals (safe under concurrent requests)
         try:
-            # Build mock schema context directly
-            schema_text = "DATABASE SCHEMA:\n\n"
-            for table in MOCK_SCHEMA.get("tables", []):
-                table_name = table.get("table_name", "")
-                columns = table.get("columns", [])
-                
-                schema_text += f"Table: {table_name}\n"
-                schema_text += "Columns:\n"
-                for col in columns:
-                    col_name = col.get("column_name", "")
-                    col_type = col.get("data_type", "")
-                    nullable = "NULL" if col.get("is_nullable") == "YES" else "NOT NULL"
-                    schema_text += f"  - {col_name} ({col_type}, {nullable})\n"
-                schema_text += "\n"
-            
-            # Temporarily patch sql_generator's schema cache and database_service
-            original_schema_cache = sql_generator._schema_cache
-            sql_generator._schema_cache = MOCK_SCHEMA
-            
-            # Mock database_service.get_schema_info if needed
-            try:
-                from app.services import database_service
-                original_get_schema_info = database_service.get_schema_info
-                
-                async def mock_get_schema_info(table_name=None):
-                    return MOCK_SCHEMA
-                
-                database_service.get_schema_info = mock_get_schema_info
-                database_service.db_type = "mysql"  # Set default DB type
-                
-            except:
-                pass  # If database_service not available, that's fine
-            
-            try:
-                sql_result = await sql_generator.generate_sql(
-                    natural_language_query=request.query,
-                    conversation_history=conversation_history
-                )
-                
-                generated_sql = sql_result["sql"]
-                sql_explanation = sql_result["explanation"]
-                confidence = sql_result["confidence"]
-                
-            finally:
-                # Restore original state
-                sql_generator._schema_cache = original_schema_cache
-                try:
-                    database_service.get_schema_info = original_get_schema_info
-                except:
-                    pass
-            
+            sql_result = await sql_generator.generate_sql(
+                natural_language_query=request.query,
+                conversation_history=conversation_history,
+                schema=MOCK_SCHEMA
+            )
+
+            generated_sql = sql_result["sql"]
+            sql_explanation = sql_result["explanation"]
+            confidence = sql_result["confidence"]
+
         except Exception as e:
             return AdminQueryResponse(
                 success=False,
@@ -217,24 +191,28 @@ async def admin_query_test(request: AdminQueryRequest):
         formatted_table = visualization_service.format_table(query_results, max_rows=100)
         summary = visualization_service.generate_summary(query_results, sql_explanation)
         
-        # Step 4: Save conversation history
-        conversation_manager.add_message(
+        # Step 4: Save conversation history after the response is sent
+        # (user + assistant in one batch; the caller doesn't need the write)
+        background_tasks.add_task(
+            conversation_manager.add_messages,
             session_id=session_id,
-            role="user",
-            content=request.query,
-            metadata={"type": "admin_query_test", "sql": generated_sql}
-        )
-        
-        conversation_manager.add_message(
-            session_id=session_id,
-            role="assistant",
-            content=f"Query executed successfully (TEST MODE). Returned {len(query_results)} mock results.",
-            metadata={
-                "type": "admin_response_test",
-                "sql": generated_sql,
-                "row_count": len(query_results),
-                "test_mode": True
-            }
+            messages=[
+                {
+                    "role": "user",
+                    "content": request.query,
+                    "metadata": {"type": "admin_query_test", "sql": generated_sql}
+                },
+                {
+                    "role": "assistant",
+                    "content": f"Query executed successfully (TEST MODE). Returned {len(query_results)} mock results.",
+                    "metadata": {
+                        "type": "admin_response_test",
+                        "sql": generated_sql,
+                        "row_count": len(query_results),
+                        "test_mode": True
+                    }
+                }
+            ]
         )
         
         # Step 5: Return comprehensive response
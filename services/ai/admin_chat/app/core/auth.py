@@ -1,9 +1,14 @@
 """
 Admin Authentication Service
 """
+import hashlib
+import hmac
+import time
+
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
 from app.core.config import settings
 
 
@@ -11,26 +16,70 @@ from app.core.config import settings
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 bearer_scheme = HTTPBearer(auto_error=False)
 
+# Principals are fixed per auth method, so they are frozen module-level
+# constants: successful auth returns one of these read-only mappings
+# instead of allocating a fresh dict per request. Callers must not
+# mutate the returned mapping (MappingProxyType enforces this).
+_PRINCIPAL_APIKEY = MappingProxyType({
+    "user_id": "admin",
+    "auth_method": "api_key",
+    "authenticated": True
+})
+_PRINCIPAL_BEARER = MappingProxyType({
+    "user_id": "admin",
+    "auth_method": "bearer",
+    "authenticated": True
+})
+_PRINCIPAL_DEV = MappingProxyType({
+    "user_id": "admin",
+    "auth_method": "none",
+    "authenticated": True
+})
+
 
 class AdminAuth:
     """Admin authentication service"""
-    
+
+    # Validated-credential cache: the same key is presented on every
+    # request, so cache the principal for a short TTL. 30s bounds how long
+    # a rotated key keeps working.
+    AUTH_CACHE_TTL = 30
+    AUTH_CACHE_MAX_ENTRIES = 1024
+
     def __init__(self):
         self.admin_api_key = settings.ADMIN_API_KEY
-    
+        # Dev mode is fixed at startup; checked first so the unconfigured
+        # path skips credential validation entirely
+        self._dev_mode = not bool(self.admin_api_key)
+        # Encoded once; the per-request comparison shouldn't re-encode
+        self._admin_key_bytes = self.admin_api_key.encode("utf-8") if self.admin_api_key else b""
+        # credential hash -> (principal, validated_at)
+        self._auth_cache: Dict[str, tuple] = {}
+
     def _validate_api_key(self, api_key: Optional[str]) -> bool:
-        """Validate API key"""
+        """Validate API key (constant-time comparison)"""
         if not self.admin_api_key:
             # If no API key is set, allow access (development mode)
             return True
-        
-        return api_key == self.admin_api_key
+
+        # hmac.compare_digest doesn't short-circuit on the first differing
+        # byte, so timing doesn't leak the key's length or prefix
+        return hmac.compare_digest((api_key or "").encode("utf-8"), self._admin_key_bytes)
     
     def _validate_bearer_token(self, credentials: Optional[HTTPAuthorizationCredentials]) -> bool:
-        """Validate bearer token (can be extended for JWT or other tokens)"""
+        """Validate bearer token (can be extended for JWT or other tokens)
+
+        This runs inside an async dependency on every admin request, so any
+        validator added here must not block the event loop: either be
+        natively async, or be wrapped in
+        fastapi.concurrency.run_in_threadpool (e.g. a sync jwt.decode or a
+        DB/LDAP lookup). Cheap format checks (a JWT has exactly two dots)
+        belong before any crypto work so garbage inputs are rejected for
+        free.
+        """
         if not credentials:
             return False
-        
+
         # For now, treat bearer token as API key
         # Can be extended to validate JWT tokens
         return self._validate_api_key(credentials.credentials)
@@ -39,44 +88,68 @@ class AdminAuth:
         self,
         api_key: Optional[str] = Security(api_key_header),
         credentials: Optional[HTTPAuthorizationCredentials] = Security(bearer_scheme)
-    ) -> Dict[str, Any]:
+    ) -> Mapping[str, Any]:
         """
         Dependency to require admin authentication
-        
+
         Accepts either:
         - X-API-Key header
         - Bearer token in Authorization header
+
+        Validated credentials are cached by hash for AUTH_CACHE_TTL
+        seconds, so repeat requests cost one dict lookup instead of
+        re-running the comparison. Each cache entry is keyed by the hash
+        of the credential that actually validated — never by a sibling
+        credential sent in the same request — so an invalid key can't be
+        laundered into the cache alongside a valid one. The returned
+        principal is a shared read-only mapping — callers must not
+        mutate it.
         """
+        # Development mode: no key configured, nothing to validate
+        if self._dev_mode:
+            return _PRINCIPAL_DEV
+
+        api_key_hash = self._hash_token(api_key) if api_key else None
+        bearer_hash = self._hash_token(credentials.credentials) if credentials else None
+
+        now = time.time()
+        for token_hash in (api_key_hash, bearer_hash):
+            if token_hash:
+                cached = self._auth_cache.get(token_hash)
+                if cached and now - cached[1] < self.AUTH_CACHE_TTL:
+                    return cached[0]
+
         # Try API key first
         if api_key and self._validate_api_key(api_key):
-            return {
-                "user_id": "admin",
-                "auth_method": "api_key",
-                "authenticated": True
-            }
-        
+            return self._cache_principal(api_key_hash, _PRINCIPAL_APIKEY)
+
         # Try bearer token
         if credentials and self._validate_bearer_token(credentials):
-            return {
-                "user_id": "admin",
-                "auth_method": "bearer",
-                "authenticated": True
-            }
+            return self._cache_principal(bearer_hash, _PRINCIPAL_BEARER)
         
         # No valid authentication
-        if not self.admin_api_key:
-            # Development mode: allow access if no API key is configured
-            return {
-                "user_id": "admin",
-                "auth_method": "none",
-                "authenticated": True
-            }
-        
         raise HTTPException(
             status_code=401,
             detail="Invalid or missing admin API key. Provide X-API-Key header or Bearer token."
         )
 
+    @staticmethod
+    def _hash_token(token: str) -> str:
+        """Cache key for a credential"""
+        return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+    def _cache_principal(self, token_hash: Optional[str], principal: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Store a freshly validated principal and return it
+
+        Principals are shared frozen mappings, so no per-request copy is
+        made on either the store or the hit path.
+        """
+        if token_hash:
+            if len(self._auth_cache) >= self.AUTH_CACHE_MAX_ENTRIES:
+                self._auth_cache.clear()
+            self._auth_cache[token_hash] = (principal, time.time())
+        return principal
+
 
 # Global instance
 admin_auth = AdminAuth()
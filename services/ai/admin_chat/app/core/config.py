@@ -2,19 +2,26 @@
 Admin Chat Configuration
 Separate from RAG chatbot - uses Groq API (same as users/providers)
 """
+from functools import lru_cache
+import os
+
 from pydantic_settings import BaseSettings
 from typing import Optional
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Load .env file from the admin_chat directory or parent
-app_root = Path(__file__).parent.parent.parent.parent  # Go up to ai/ directory
-env_path = app_root / ".env"
-if env_path.exists():
-    load_dotenv(env_path)
-else:
-    # Fallback: try current directory
-    load_dotenv()
+# Load .env file from the admin_chat directory or parent; the sentinel
+# keeps other processes/entry points that import this module from
+# re-walking the dotenv file after it's already in os.environ
+if not os.environ.get("HIVA_ENV_LOADED"):
+    app_root = Path(__file__).parent.parent.parent.parent  # Go up to ai/ directory
+    env_path = app_root / ".env"
+    if env_path.exists():
+        load_dotenv(env_path)
+    else:
+        # Fallback: try current directory
+        load_dotenv()
+    os.environ["HIVA_ENV_LOADED"] = "1"
 
 
 class AdminSettings(BaseSettings):
@@ -78,6 +85,18 @@ class AdminSettings(BaseSettings):
         extra = "allow"  # Allow extra fields from shared .env
 
 
-settings = AdminSettings()
+@lru_cache(maxsize=1)
+def get_settings() -> AdminSettings:
+    """Build (once) and return the settings singleton
+
+    Pydantic validation of AdminSettings walks the whole environment;
+    callers that can't import the module-level instance (e.g. FastAPI
+    dependency overrides in tests) should use this instead of
+    constructing AdminSettings themselves.
+    """
+    return AdminSettings()
+
+
+settings = get_settings()
 
 
@@ -2,9 +2,18 @@
 Chat Handler Service
 Handles general conversation queries (non-data requests)
 """
+import hashlib
+import logging
+
 from typing import Dict, Any
 from app.services.llm_client import llm_client
 from app.services.intent_router import intent_router
+from app.services.sql_pipeline import singleflight
+
+# The chat system prompt is immutable per process; fetch it once at import
+_SYSTEM_PROMPT = intent_router.get_chat_prompt()
+
+logger = logging.getLogger(__name__)
 
 
 class ChatHandler:
@@ -12,7 +21,36 @@ class ChatHandler:
     Handles general conversation and non-data queries
     Uses standard LLM without MCP tools
     """
-    
+
+    # Prebuilt failure payload: during provider outages this is returned per
+    # failed turn, so it isn't rebuilt each time. The raw exception text goes
+    # to the log, not to the caller.
+    _FALLBACK_ERROR = {
+        "success": False,
+        "intent": "CHAT",
+        "mode": "chat",
+        "response": (
+            "I apologize, but I'm having trouble processing your request. "
+            "Please try again or ask me about data queries."
+        ),
+    }
+
+    @staticmethod
+    def _build_messages(user_query: str, conversation_history: list = None) -> list:
+        """Build the native chat message list for one turn
+
+        The LLM providers are OpenAI-compatible, so role boundaries go to
+        the model directly instead of being flattened into one string.
+        """
+        return [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            *(
+                {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+                for msg in (conversation_history or [])[-5:]  # Last 5 messages
+            ),
+            {"role": "user", "content": user_query},
+        ]
+
     async def handle_chat(
         self,
         user_query: str,
@@ -21,50 +59,30 @@ class ChatHandler:
     ) -> Dict[str, Any]:
         """
         Handle general conversation query
-        
+
         Args:
             user_query: User's input
             session_id: Optional session ID
             conversation_history: Optional conversation history
-        
+
         Returns:
             Response dictionary
         """
         try:
-            # Build prompt with system message and conversation context
-            system_prompt = intent_router.get_chat_prompt()
-            
-            # Build conversation context
-            messages = []
-            
-            # Add system prompt
-            messages.append({
-                "role": "system",
-                "content": system_prompt
-            })
-            
-            # Add conversation history if available
-            if conversation_history:
-                for msg in conversation_history[-5:]:  # Last 5 messages
-                    messages.append({
-                        "role": msg.get("role", "user"),
-                        "content": msg.get("content", "")
-                    })
-            
-            # Add current user query
-            messages.append({
-                "role": "user",
-                "content": user_query
-            })
-            
-            # Format messages for LLM
-            prompt_text = self._format_messages(messages)
-            
-            # Generate response
-            response = await llm_client.generate(
-                prompt=prompt_text,
-                temperature=0.7,  # Slightly higher for natural conversation
-                max_tokens=500
+            messages = self._build_messages(user_query, conversation_history)
+
+            # Generate response; identical concurrent turns (dashboard
+            # refreshes, retry storms) share one in-flight upstream call
+            key = "chat:" + hashlib.md5(
+                "\x1f".join(f"{m['role']}:{m['content']}" for m in messages).encode()
+            ).hexdigest()
+            response = await singleflight(
+                key,
+                lambda: llm_client.chat(
+                    messages=messages,
+                    temperature=0.7,  # Slightly higher for natural conversation
+                    max_tokens=500
+                )
             )
             
             return {
@@ -75,29 +93,43 @@ class ChatHandler:
             }
         
         except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "intent": "CHAT",
-                "mode": "chat",
-                "response": "I apologize, but I'm having trouble processing your request. Please try again or ask me about data queries."
-            }
-    
-    def _format_messages(self, messages: list) -> str:
-        """Format messages for LLM prompt"""
-        formatted = []
-        for msg in messages:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            
-            if role == "system":
-                formatted.append(f"System: {content}")
-            elif role == "user":
-                formatted.append(f"User: {content}")
-            elif role == "assistant":
-                formatted.append(f"Assistant: {content}")
-        
-        return "\n\n".join(formatted)
+            logger.exception("Chat handling failed for session %s", session_id)
+            return {**self._FALLBACK_ERROR, "error": type(e).__name__}
+
+    async def handle_chat_stream(
+        self,
+        user_query: str,
+        session_id: str = None,
+        conversation_history: list = None
+    ):
+        """
+        Handle general conversation query, yielding the reply as it streams
+
+        Streaming variant of handle_chat: the same message list is sent
+        with stream=True and chunks are yielded as the provider emits
+        them, so the caller can forward tokens to the client instead of
+        waiting for the full completion. Failures are logged and the
+        standard fallback message is yielded as a final chunk.
+
+        Args:
+            user_query: User's input
+            session_id: Optional session ID
+            conversation_history: Optional conversation history
+
+        Yields:
+            Response text chunks, in order
+        """
+        messages = self._build_messages(user_query, conversation_history)
+        try:
+            async for chunk in llm_client.stream(
+                messages=messages,
+                temperature=0.7,  # Slightly higher for natural conversation
+                max_tokens=500
+            ):
+                yield chunk
+        except Exception:
+            logger.exception("Chat streaming failed for session %s", session_id)
+            yield self._FALLBACK_ERROR["response"]
 
 
 # Global instance
@@ -3,6 +3,7 @@ Phase 4: Confidence Scorer
 Calculates confidence scores and triggers clarification requests
 """
 
+from functools import lru_cache
 import re
 from typing import Dict, Any, Optional, Tuple, List
 
@@ -34,27 +35,54 @@ class ConfidenceScorer:
     }
     
     # Domain 1 tables (allowed)
-    DOMAIN1_TABLES = [
+    DOMAIN1_TABLES = frozenset({
         'claims', 'service_summaries', 'service_summary_diagnosis',
         'diagnoses', 'claims_services', 'services'
-    ]
-    
+    })
+
     # Domain 2 tables (allowed)
-    DOMAIN2_TABLES = [
+    DOMAIN2_TABLES = frozenset({
         'providers', 'claims', 'service_summaries', 'service_summary_diagnosis',
         'diagnoses', 'claims_services', 'services'
-    ]
-    
-    # Out-of-domain tables (not allowed)
-    OUT_OF_DOMAIN_TABLES = [
+    })
+
+    # Out-of-domain tables (not allowed); kept as a tuple so clarification
+    # messages list the offending tables in a stable order
+    OUT_OF_DOMAIN_TABLES = (
         'users', 'payments', 'roles', 'permissions',
         'accreditation', 'telescope', 'admin', 'metadata', 'wallets', 'ratings'
-    ]
-    
+    )
+
+    # Tables tolerated in state-filter queries despite being out-of-domain
+    _STATE_USER_EXCEPTIONS = frozenset({'users', 'states'})
+
+    # Precompiled scans, built once at class load. The SQL is tokenized
+    # into an identifier set a single time per scoring call; the structural
+    # checks below are then O(1) set membership instead of substring scans.
+    _JOIN_RE = re.compile(r'\bJOIN\b', re.IGNORECASE)
+    _IDENT_RE = re.compile(r'[A-Z_][A-Z0-9_]*')
+
+    # Query-context alternations: one regex pass over the lowered query
+    # replaces a chain of per-keyword substring scans
+    _STATE_RE = re.compile(
+        r'\b(?:zamfara|kano|kogi|kaduna|fct|abuja|adamawa|sokoto|rivers|osun|lagos|states?)\b'
+    )
+    _DISEASE_RE = re.compile(r'\b(?:diseases?|diagnos[ie]s)\b')
+
+    # Required join-path tables per intent family (token form)
+    _REQUIRED_DIAGNOSIS_PATH = frozenset({
+        'SERVICE_SUMMARIES', 'SERVICE_SUMMARY_DIAGNOSIS', 'DIAGNOSES'
+    })
+    _REQUIRED_SERVICE_PATH = _REQUIRED_DIAGNOSIS_PATH | {'CLAIMS_SERVICES', 'SERVICES'}
+
+    @lru_cache(maxsize=4096)
     def score(self, sql: str, query: str, intent: str, domain: str = 'clinical_claims_diagnosis') -> Tuple[float, Optional[str]]:
         """
         Calculate confidence score for SQL query.
-        
+
+        Scoring is deterministic over (sql, query, intent, domain), so
+        results are memoized and cached SQL generations skip the re-scan.
+
         Args:
             sql: Generated SQL query
             query: Original natural language query
@@ -70,14 +98,14 @@ class ConfidenceScorer:
             return (0.0, "No SQL query generated. Please try rephrasing your question.")
         sql_upper = sql.upper()
         query_lower = query.lower()
-        
+        # Tokenize the SQL once; the structural checks below are set lookups
+        sql_tokens = frozenset(self._IDENT_RE.findall(sql_upper))
+
         # Start with base confidence
         confidence = 0.8
 
         # Detect disease aggregation structure (non-state)
-        is_disease_query = any(keyword in query_lower for keyword in [
-            'disease', 'diagnosis', 'diagnoses'
-        ])
+        is_disease_query = bool(self._DISEASE_RE.search(query_lower))
         has_disease_structure = (
             'GROUP BY' in sql_upper and
             'COUNT' in sql_upper and
@@ -85,22 +113,17 @@ class ConfidenceScorer:
             'STATENAME' not in sql_upper
         )
         
-        # Determine expected joins and allowed tables based on domain
+        # Determine expected joins based on domain
         if domain == 'providers_facilities':
             expected_joins_map = self.EXPECTED_JOIN_COUNT_DOMAIN2
-            allowed_tables = self.DOMAIN2_TABLES
             domain_name = "providers & facilities performance"
         else:
             expected_joins_map = self.EXPECTED_JOIN_COUNT_DOMAIN1
-            allowed_tables = self.DOMAIN1_TABLES
             domain_name = "clinical claims analysis"
         
         # Check 1: Join count
         # Allow users/states tables for state filtering queries
-        is_state_query = any(state in query_lower for state in [
-            'zamfara', 'kano', 'kogi', 'kaduna', 'fct', 'abuja', 'adamawa',
-            'sokoto', 'rivers', 'osun', 'lagos', 'state', 'states'
-        ])
+        is_state_query = bool(self._STATE_RE.search(query_lower))
         
         join_count = self._count_joins(sql_upper)
         # Map intent to expected joins
@@ -141,10 +164,10 @@ class ConfidenceScorer:
         
         # Check 2: Out-of-domain tables
         # is_state_query already defined above
-        out_of_domain_tables = self._find_out_of_domain_tables(sql_upper, allowed_tables)
+        out_of_domain_tables = self._find_out_of_domain_tables(sql_tokens)
         # Filter out users/states if it's a state query
         if is_state_query:
-            out_of_domain_tables = [t for t in out_of_domain_tables if t.lower() not in ['users', 'states']]
+            out_of_domain_tables = [t for t in out_of_domain_tables if t not in self._STATE_USER_EXCEPTIONS]
         
         if out_of_domain_tables:
             confidence -= 0.3
@@ -157,7 +180,7 @@ class ConfidenceScorer:
         
         # Check 3: Unclear aggregation
         # For state queries, be more lenient - they often need complex joins
-        if not self._has_clear_aggregation(sql_upper, intent):
+        if not self._has_clear_aggregation(sql_tokens, intent):
             if is_state_query:
                 # State queries are complex - just reduce confidence slightly, don't block
                 confidence -= 0.05
@@ -173,7 +196,7 @@ class ConfidenceScorer:
                     )
         
         # Check 4: Missing required joins for intent
-        if not self._has_required_joins(sql_upper, intent):
+        if not self._has_required_joins(sql_tokens, intent):
             confidence -= 0.1
         
         # Normalize confidence to 0.0-1.0
@@ -204,50 +227,62 @@ class ConfidenceScorer:
         
         return (confidence, None)
     
+    def score_batch(
+        self,
+        sqls: List[str],
+        query: str,
+        intent: str,
+        domain: str = 'clinical_claims_diagnosis'
+    ) -> List[Tuple[float, Optional[str]]]:
+        """
+        Score multiple candidate SQLs for one user turn
+
+        Convenience entry point for best-of-N / self-consistency
+        generation. score() is memoized, so duplicate candidates are
+        scanned once, and the regexes are compiled at class load —
+        per-candidate work is one linear tokenization pass plus set
+        lookups.
+
+        Args:
+            sqls: Candidate SQL queries
+            query: Original natural language query
+            intent: Classified intent
+            domain: Domain the query belongs to
+
+        Returns:
+            List of (confidence_score, clarification_message) tuples, one
+            per candidate, in input order
+        """
+        return [self.score(sql, query, intent, domain) for sql in sqls]
+
     def _count_joins(self, sql: str) -> int:
         """Count number of JOINs in SQL"""
-        return len(re.findall(r'\bJOIN\b', sql, re.IGNORECASE))
-    
-    def _find_out_of_domain_tables(self, sql: str, allowed_tables: List[str]) -> List[str]:
-        """Find tables that are outside the domain"""
-        found = []
-        for table in self.OUT_OF_DOMAIN_TABLES:
-            # Check for table name in SQL (as whole word)
-            pattern = rf'\b{table}\b'
-            if re.search(pattern, sql, re.IGNORECASE):
-                found.append(table)
-        return found
-    
-    def _has_clear_aggregation(self, sql: str, intent: str) -> bool:
-        """Check if SQL has clear aggregation for the intent"""
+        return len(self._JOIN_RE.findall(sql))
+
+    def _find_out_of_domain_tables(self, sql_tokens: frozenset) -> List[str]:
+        """Find tables that are outside the domain (set membership per table)"""
+        return [table for table in self.OUT_OF_DOMAIN_TABLES if table.upper() in sql_tokens]
+
+    def _has_clear_aggregation(self, sql_tokens: frozenset, intent: str) -> bool:
+        """Check if the tokenized SQL has clear aggregation for the intent"""
         if intent == 'FREQUENCY_VOLUME':
-            return 'COUNT' in sql
+            return 'COUNT' in sql_tokens
         elif intent == 'TREND_TIME_SERIES':
-            return 'COUNT' in sql and ('DATE_FORMAT' in sql or 'DATE(' in sql)
+            return 'COUNT' in sql_tokens and ('DATE_FORMAT' in sql_tokens or 'DATE' in sql_tokens)
         elif intent == 'COST_FINANCIAL':
-            return 'AVG' in sql or 'SUM' in sql
+            return 'AVG' in sql_tokens or 'SUM' in sql_tokens
         elif intent == 'SERVICE_UTILIZATION':
-            return 'COUNT' in sql
+            return 'COUNT' in sql_tokens
         return True  # Default: assume clear
-    
-    def _has_required_joins(self, sql: str, intent: str) -> bool:
-        """Check if SQL has required joins for the intent"""
+
+    def _has_required_joins(self, sql_tokens: frozenset, intent: str) -> bool:
+        """Check if the tokenized SQL has required joins for the intent"""
         if intent in ['FREQUENCY_VOLUME', 'TREND_TIME_SERIES', 'COST_FINANCIAL']:
             # Must have: claims → service_summaries → service_summary_diagnosis → diagnoses
-            return (
-                'SERVICE_SUMMARIES' in sql and
-                'SERVICE_SUMMARY_DIAGNOSIS' in sql and
-                'DIAGNOSES' in sql
-            )
+            return self._REQUIRED_DIAGNOSIS_PATH <= sql_tokens
         elif intent == 'SERVICE_UTILIZATION':
             # Must also have: claims_services → services
-            return (
-                'SERVICE_SUMMARIES' in sql and
-                'SERVICE_SUMMARY_DIAGNOSIS' in sql and
-                'DIAGNOSES' in sql and
-                'CLAIMS_SERVICES' in sql and
-                'SERVICES' in sql
-            )
+            return self._REQUIRED_SERVICE_PATH <= sql_tokens
         return True  # Default: assume OK
 
 
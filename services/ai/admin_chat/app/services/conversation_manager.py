@@ -4,12 +4,25 @@ Conversation history and context management
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 import json
-from collections import defaultdict
+import re
+import time
+from collections import OrderedDict, defaultdict, deque
+from itertools import islice
+
+# Follow-up indicators, compiled once; plain substring alternation so it
+# matches exactly what the old per-phrase `in` loop matched
+_FOLLOWUP_RE = re.compile(
+    r'continue|more|also|and|what about|how about|tell me more|what else',
+    re.IGNORECASE
+)
 
 
 class ConversationManager:
     """Manages conversation history and context for intelligent responses"""
-    
+
+    # Minimum seconds between TTL sweeps; writes between sweeps pay nothing
+    CLEANUP_INTERVAL = 60
+
     def __init__(self, max_history: int = 10, ttl_hours: int = 24):
         """
         Args:
@@ -18,9 +31,26 @@ class ConversationManager:
         """
         self.max_history = max_history
         self.ttl = timedelta(hours=ttl_hours)
-        self._conversations: Dict[str, List[Dict]] = defaultdict(list)
-        self._timestamps: Dict[str, datetime] = {}
+        # Bounded deques trim themselves on append (O(1)), replacing the
+        # old copy-the-tail reassignment once a history filled up
+        self._conversations: Dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=max_history * 2)
+        )
+        # Ordered oldest-write-first: each write moves its session to the
+        # end, so TTL cleanup pops expired sessions off the front and
+        # stops at the first live one instead of scanning every session
+        self._timestamps: "OrderedDict[str, datetime]" = OrderedDict()
+        self._last_cleanup = 0.0
         self._branch_context: Dict[str, Dict] = {}  # branch_id -> context info
+        # Serialized branch context, invalidated when the branch is reset;
+        # the same JSON would otherwise be re-dumped on every LLM call
+        self._branch_json_cache: Dict[str, str] = {}
+        # Formatted get_messages results per session, invalidated on write
+        self._projection_cache: Dict[str, Dict[tuple, List[Dict]]] = {}
+        # Conversation summaries per session, invalidated on write;
+        # summaries are deterministic over the history, so between writes
+        # repeated LLM calls reuse the same string
+        self._summary_cache: Dict[str, str] = {}
     
     def add_message(
         self,
@@ -31,53 +61,115 @@ class ConversationManager:
         metadata: Optional[Dict] = None
     ):
         """Add a message to conversation history"""
+        now = datetime.now()
+
         # Clean old conversations
-        self._cleanup_old_conversations()
-        
+        self._cleanup_old_conversations(now)
+
         message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "metadata": metadata or {}
         }
-        
+
         if branch_id:
             message["metadata"]["branch_id"] = branch_id
-        
+
         self._conversations[session_id].append(message)
-        self._timestamps[session_id] = datetime.now()
-        
-        # Limit history size
-        if len(self._conversations[session_id]) > self.max_history * 2:
-            # Keep system messages and recent messages
-            recent = self._conversations[session_id][-self.max_history:]
-            self._conversations[session_id] = recent
+        self._timestamps[session_id] = now
+        self._timestamps.move_to_end(session_id)
+        self._projection_cache.pop(session_id, None)
+        self._summary_cache.pop(session_id, None)
     
+    def add_messages(
+        self,
+        session_id: str,
+        messages: List[Dict],
+        branch_id: Optional[str] = None
+    ):
+        """
+        Add several messages to conversation history in one call
+
+        Batches the TTL cleanup, timestamp update, and history trim that
+        add_message pays per message, so the usual user+assistant pair
+        costs one pass instead of two.
+
+        Args:
+            session_id: Conversation session
+            messages: List of dicts with 'role', 'content', optional 'metadata'
+        """
+        if not messages:
+            return
+
+        now = datetime.now()
+
+        # Clean old conversations once for the whole batch
+        self._cleanup_old_conversations(now)
+
+        conversation = self._conversations[session_id]
+
+        for spec in messages:
+            message = {
+                "role": spec["role"],
+                "content": spec["content"],
+                "timestamp": now.isoformat(),
+                "metadata": spec.get("metadata") or {}
+            }
+            if branch_id:
+                message["metadata"]["branch_id"] = branch_id
+            conversation.append(message)
+
+        self._timestamps[session_id] = now
+        self._timestamps.move_to_end(session_id)
+        self._projection_cache.pop(session_id, None)
+        self._summary_cache.pop(session_id, None)
+
     def get_messages(
         self,
         session_id: str,
         include_system: bool = True,
-        max_messages: Optional[int] = None
+        max_messages: Optional[int] = None,
+        projection: tuple = ("role", "content")
     ) -> List[Dict[str, str]]:
-        """Get conversation messages formatted for LLM"""
+        """
+        Get conversation messages formatted for LLM
+
+        Only the fields named in `projection` are copied out, so heavy
+        metadata (SQL, phase4 audit blobs) never gets serialized into the
+        LLM context. Formatted results are cached per session until the
+        next write, so repeated refine/chat calls reuse the same history.
+
+        Args:
+            session_id: Conversation session
+            include_system: Kept for API compatibility
+            max_messages: Return only the most recent N messages
+            projection: Message fields to include in the output
+        """
         if session_id not in self._conversations:
             return []
-        
-        messages = self._conversations[session_id].copy()
-        
-        # Filter by max_messages if specified
+
+        cache_key = (max_messages, projection)
+        session_cache = self._projection_cache.setdefault(session_id, {})
+        cached = session_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        messages = self._conversations[session_id]
+
+        # Filter by max_messages if specified (islice the deque tail
+        # before projecting, without copying the full history)
         if max_messages:
-            messages = messages[-max_messages:]
-        
-        # Format for LLM
-        formatted = []
-        for msg in messages:
-            formatted.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
-        
-        return formatted
+            messages = islice(messages, max(0, len(messages) - max_messages), None)
+
+        # Project only the requested fields
+        formatted = [
+            {field: msg.get(field) for field in projection}
+            for msg in messages
+        ]
+
+        session_cache[cache_key] = formatted
+        return list(formatted)
     
     def get_branch_context(self, branch_id: str) -> Dict:
         """Get branch-specific context"""
@@ -86,31 +178,40 @@ class ConversationManager:
     def set_branch_context(self, branch_id: str, context: Dict):
         """Set branch-specific context (modes of operation, policies, etc.)"""
         self._branch_context[branch_id] = context
+        self._branch_json_cache.pop(branch_id, None)
     
     def get_conversation_summary(self, session_id: str) -> str:
-        """Generate a comprehensive summary of the conversation for context awareness"""
+        """Generate a comprehensive summary of the conversation for context awareness
+
+        Cached per session until the next write, so repeated LLM calls on
+        an unchanged history skip the message walk entirely.
+        """
         if session_id not in self._conversations:
             return ""
-        
+
+        cached = self._summary_cache.get(session_id)
+        if cached is not None:
+            return cached
+
         messages = self._conversations[session_id]
         if len(messages) < 2:
             return ""
-        
+
         # Get recent conversation (last 6 messages for better context)
-        recent_messages = messages[-6:]
+        recent_messages = list(islice(messages, max(0, len(messages) - 6), None))
         
-        # Extract key information
-        user_queries = [msg["content"] for msg in recent_messages if msg["role"] == "user"]
-        assistant_responses = [msg["content"] for msg in recent_messages if msg["role"] == "assistant"]
-        
-        # Detect branch from conversation history
+        # Extract user queries and the branch in a single pass; the
+        # earliest branch_id in the window wins, matching the old
+        # forward break (assistant responses were collected but never
+        # used, so that list is gone)
+        user_queries = []
         branch_mentioned = None
         for msg in recent_messages:
-            branch = msg.get("metadata", {}).get("branch_id")
-            if branch:
-                branch_mentioned = branch
-                break
-        
+            if msg["role"] == "user":
+                user_queries.append(msg["content"])
+            if branch_mentioned is None:
+                branch_mentioned = msg.get("metadata", {}).get("branch_id")
+
         # Build comprehensive summary
         summary_parts = []
         
@@ -125,12 +226,13 @@ class ConversationManager:
         
         # Detect if this is a follow-up question
         if len(user_queries) > 1:
-            current_query = user_queries[-1].lower()
-            follow_up_indicators = ["continue", "more", "also", "and", "what about", "how about", "tell me more", "what else"]
-            if any(indicator in current_query for indicator in follow_up_indicators) or len(current_query.split()) < 5:
+            current_query = user_queries[-1]
+            if _FOLLOWUP_RE.search(current_query) or len(current_query.split()) < 5:
                 summary_parts.append("This appears to be a follow-up question. Use the previous conversation context to provide a complete answer.")
         
-        return " ".join(summary_parts) if summary_parts else ""
+        summary = " ".join(summary_parts) if summary_parts else ""
+        self._summary_cache[session_id] = summary
+        return summary
     
     def clear_conversation(self, session_id: str):
         """Clear conversation history for a session"""
@@ -138,15 +240,29 @@ class ConversationManager:
             del self._conversations[session_id]
         if session_id in self._timestamps:
             del self._timestamps[session_id]
+        self._projection_cache.pop(session_id, None)
+        self._summary_cache.pop(session_id, None)
     
-    def _cleanup_old_conversations(self):
-        """Remove conversations older than TTL"""
-        now = datetime.now()
-        expired = [
-            session_id for session_id, timestamp in self._timestamps.items()
-            if now - timestamp > self.ttl
-        ]
-        for session_id in expired:
+    def _cleanup_old_conversations(self, now: Optional[datetime] = None):
+        """Remove conversations older than TTL
+
+        _timestamps is ordered by last write, so expired sessions sit at
+        the front; popping stops at the first live session. Sweeps run at
+        most once per CLEANUP_INTERVAL, so most writes skip this entirely.
+
+        Args:
+            now: Current time, if the caller already fetched it
+        """
+        now_mono = time.monotonic()
+        if now_mono - self._last_cleanup < self.CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now_mono
+
+        cutoff = (now or datetime.now()) - self.ttl
+        while self._timestamps:
+            session_id, timestamp = next(iter(self._timestamps.items()))
+            if timestamp > cutoff:
+                break
             self.clear_conversation(session_id)
     
     def get_context_for_llm(
@@ -163,7 +279,11 @@ class ConversationManager:
         if branch_id:
             branch_ctx = self.get_branch_context(branch_id)
             if branch_ctx:
-                context_parts.append(f"=== BRANCH: {branch_id.upper()} ===\nBranch Information: {json.dumps(branch_ctx, indent=2)}\n")
+                branch_json = self._branch_json_cache.get(branch_id)
+                if branch_json is None:
+                    branch_json = json.dumps(branch_ctx, indent=2)
+                    self._branch_json_cache[branch_id] = branch_json
+                context_parts.append(f"=== BRANCH: {branch_id.upper()} ===\nBranch Information: {branch_json}\n")
         
         # Add RAG context with branch label
         if rag_context:
@@ -179,16 +299,17 @@ class ConversationManager:
         
         # Add recent conversation history for better context understanding (last 2 exchanges)
         if session_id in self._conversations and len(self._conversations[session_id]) > 2:
-            recent = self._conversations[session_id][-4:]  # Last 2 user-assistant exchanges
+            conv = self._conversations[session_id]
+            recent = list(islice(conv, max(0, len(conv) - 4), None))  # Last 2 user-assistant exchanges
             if recent:
                 context_parts.append("=== RECENT CONVERSATION HISTORY ===\n")
-                for msg in recent:
-                    role = msg.get("role", "unknown")
-                    content = msg.get("content", "")[:200]  # Limit length
-                    if role == "user":
-                        context_parts.append(f"User: {content}")
-                    elif role == "assistant":
-                        context_parts.append(f"Assistant: {content}")
+                context_parts.extend(
+                    f"User: {msg.get('content', '')[:200]}"  # Limit length
+                    if msg.get("role") == "user"
+                    else f"Assistant: {msg.get('content', '')[:200]}"
+                    for msg in recent
+                    if msg.get("role") in ("user", "assistant")
+                )
                 context_parts.append("=== END OF CONVERSATION HISTORY ===\n")
         
         return "\n\n".join(context_parts) if context_parts else None
@@ -4,7 +4,8 @@ Supports both PostgreSQL and MySQL
 """
 import os
 import re
-from typing import Optional, List, Dict, Any, Union
+import time
+from typing import Optional, List, Dict, Any, Tuple, Union
 from contextlib import asynccontextmanager
 import asyncio
 from app.core.config import settings
@@ -25,14 +26,34 @@ except ImportError:
     MYSQL_AVAILABLE = False
 
 
+# Read-only guard patterns, compiled once. The lookarounds reproduce the
+# old re.split word check (delimiters: whitespace, comma, semicolon,
+# parens), so forbidden words inside quoted literals still don't
+# false-positive, but detection is one linear scan per query instead of
+# a split plus a per-keyword Python loop.
+_SELECT_RE = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+_FORBIDDEN_RE = re.compile(
+    r'(?:^|(?<=[\s,;()]))'
+    r'(INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|TRUNCATE|GRANT|REVOKE|EXEC|EXECUTE|REPLACE)'
+    r'(?=$|[\s,;()])',
+    re.IGNORECASE
+)
+
+
 class DatabaseService:
     """Manages read-only database connections for analytics queries"""
-    
+
+    # Schema rarely changes; cached results skip an information_schema
+    # aggregation and a network round trip per admin query
+    SCHEMA_CACHE_TTL = 300
+
     def __init__(self):
         self.pool: Optional[Union[PostgresPool, MySQLPool]] = None
         self.db_type: Optional[str] = None
         self._connection_config: Optional[Dict[str, Any]] = None
         self._initialized = False
+        # table_name (or None for all tables) -> (fetched_at, schema dict)
+        self._schema_cache: Dict[Optional[str], Tuple[float, Dict[str, Any]]] = {}
     
     def _get_connection_config(self) -> Optional[Dict[str, Any]]:
         """Get database connection configuration from settings"""
@@ -78,9 +99,14 @@ class DatabaseService:
                 conn_string = f"postgresql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
                 self.pool = await asyncpg.create_pool(
                     conn_string,
-                    min_size=2,
-                    max_size=10,
+                    min_size=5,
+                    max_size=15,
+                    max_inactive_connection_lifetime=1800,
                     command_timeout=60,
+                    # Per-connection prepared-statement cache: repeated
+                    # query text (schema lookups, cached SQL re-runs)
+                    # skips parse/plan/describe after the first execution
+                    statement_cache_size=256,
                     server_settings={
                         'application_name': 'hiva_admin_insights',
                         'statement_timeout': '60000',
@@ -98,8 +124,9 @@ class DatabaseService:
                     db=config['database'],
                     user=config['user'],
                     password=config['password'],
-                    minsize=2,
-                    maxsize=10,
+                    minsize=5,
+                    maxsize=15,
+                    pool_recycle=1800,
                     autocommit=False
                 )
                 print("✅ MySQL connection pool initialized")
@@ -112,6 +139,33 @@ class DatabaseService:
             print(f"❌ Failed to initialize database pool: {e}")
             self._initialized = True  # Mark as initialized to prevent retry loops
     
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool size/usage statistics for health reporting"""
+        if not self.pool:
+            return {"available": False}
+
+        try:
+            if self.db_type == "postgresql":
+                return {
+                    "available": True,
+                    "size": self.pool.get_size(),
+                    "idle": self.pool.get_idle_size(),
+                    "min_size": self.pool.get_min_size(),
+                    "max_size": self.pool.get_max_size()
+                }
+            elif self.db_type == "mysql":
+                return {
+                    "available": True,
+                    "size": self.pool.size,
+                    "idle": self.pool.freesize,
+                    "min_size": self.pool.minsize,
+                    "max_size": self.pool.maxsize
+                }
+        except Exception:
+            pass
+
+        return {"available": True}
+
     async def close(self):
         """Close database connection pool"""
         if self.pool:
@@ -137,6 +191,23 @@ class DatabaseService:
         finally:
             self.pool.release(conn)
     
+    def _ensure_read_only(self, query: str):
+        """
+        Security: Ensure query is read-only (no INSERT, UPDATE, DELETE, DROP, etc.)
+
+        Raises:
+            ValueError: If the query is not a plain SELECT
+        """
+        # Must start with SELECT
+        if not _SELECT_RE.match(query):
+            raise ValueError(f"Query must start with SELECT. Only read-only queries are allowed.")
+
+        # Check for forbidden keywords appearing as standalone words (not in
+        # a string literal) in a single compiled pass
+        match = _FORBIDDEN_RE.search(query)
+        if match:
+            raise ValueError(f"Query contains forbidden keyword '{match.group(1).upper()}'. Only SELECT queries are allowed.")
+
     async def execute_query(
         self,
         query: str,
@@ -154,36 +225,26 @@ class DatabaseService:
         """
         if not self.pool:
             raise RuntimeError("Database not available")
-        
-        # Security: Ensure query is read-only (no INSERT, UPDATE, DELETE, DROP, etc.)
-        query_upper = query.strip().upper()
-        
-        # Must start with SELECT
-        if not query_upper.startswith('SELECT'):
-            raise ValueError(f"Query must start with SELECT. Only read-only queries are allowed.")
-        
-        # Check for forbidden keywords (but allow them in string literals/comments)
-        # Split by common SQL delimiters to avoid false positives
-        forbidden_keywords = [
-            'INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER',
-            'TRUNCATE', 'GRANT', 'REVOKE', 'EXEC', 'EXECUTE', 'REPLACE'
-        ]
-        
-        # Check if any forbidden keyword appears as a standalone word (not in a string)
-        words = re.split(r'[\s,;()]+', query_upper)
-        for keyword in forbidden_keywords:
-            if keyword in words:
-                raise ValueError(f"Query contains forbidden keyword '{keyword}'. Only SELECT queries are allowed.")
-        
+
+        self._ensure_read_only(query)
+
         async with self.get_connection() as conn:
             try:
                 if self.db_type == "postgresql":
-                    if params:
-                        rows = await conn.fetch(query, *params)
-                    else:
-                        rows = await conn.fetch(query)
-                    # Convert asyncpg.Record to dict
-                    return [dict(row) for row in rows]
+                    # Iterate a server-side cursor and convert each Record
+                    # as it arrives: only the dict representation is ever
+                    # held, instead of a full Record list plus a full dict
+                    # list (2x peak memory on large result sets). asyncpg
+                    # cursors require an explicit transaction.
+                    results: List[Dict[str, Any]] = []
+                    async with conn.transaction():
+                        cursor = (
+                            conn.cursor(query, *params, prefetch=1000)
+                            if params else conn.cursor(query, prefetch=1000)
+                        )
+                        async for record in cursor:
+                            results.append(dict(record))
+                    return results
                     
                 elif self.db_type == "mysql":
                     async with conn.cursor(aiomysql.DictCursor) as cursor:
@@ -198,19 +259,96 @@ class DatabaseService:
             except Exception as e:
                 raise RuntimeError(f"Query execution failed: {str(e)}")
     
+    async def execute_query_streaming(
+        self,
+        query: str,
+        limit: int,
+        params: Optional[List[Any]] = None
+    ) -> tuple:
+        """
+        Execute a read-only SQL query, streaming rows with a server-side cursor
+        and stopping once `limit` rows have been collected
+
+        Peak memory stays O(limit) instead of O(result set), since rows beyond
+        the cap are never materialized client-side.
+
+        Args:
+            query: SQL query string
+            limit: Maximum number of rows to return
+            params: Optional query parameters for parameterized queries
+
+        Returns:
+            Tuple of (rows, had_more) where had_more indicates the result set
+            was truncated at `limit`
+        """
+        if not self.pool:
+            raise RuntimeError("Database not available")
+
+        self._ensure_read_only(query)
+
+        rows: List[Dict[str, Any]] = []
+        async with self.get_connection() as conn:
+            try:
+                if self.db_type == "postgresql":
+                    # asyncpg cursors require an explicit transaction
+                    async with conn.transaction():
+                        cursor = conn.cursor(query, *params) if params else conn.cursor(query)
+                        async for record in cursor:
+                            rows.append(dict(record))
+                            if len(rows) > limit:
+                                break
+
+                elif self.db_type == "mysql":
+                    # SSDictCursor streams rows instead of buffering the full set
+                    async with conn.cursor(aiomysql.SSDictCursor) as cursor:
+                        if params:
+                            await cursor.execute(query, params)
+                        else:
+                            await cursor.execute(query)
+                        while len(rows) <= limit:
+                            batch = await cursor.fetchmany(500)
+                            if not batch:
+                                break
+                            rows.extend(batch)
+
+            except Exception as e:
+                raise RuntimeError(f"Query execution failed: {str(e)}")
+
+        had_more = len(rows) > limit
+        return rows[:limit], had_more
+
     async def get_schema_info(self, table_name: Optional[str] = None) -> Dict[str, Any]:
         """
         Get database schema information
-        
+
+        Results are served from an in-process cache for SCHEMA_CACHE_TTL
+        seconds; use invalidate_schema_cache() after a migration.
+
         Args:
             table_name: Optional specific table name, or None for all tables
-        
+
         Returns:
             Schema information dictionary
         """
         if not self.pool:
             return {}
-        
+
+        now = time.monotonic()
+        entry = self._schema_cache.get(table_name)
+        if entry and now - entry[0] < self.SCHEMA_CACHE_TTL:
+            return entry[1]
+
+        result = await self._fetch_schema_info(table_name)
+        if result:
+            self._schema_cache[table_name] = (now, result)
+        return result
+
+    def invalidate_schema_cache(self):
+        """Drop cached schema info (for tests and manual eviction)"""
+        self._schema_cache.clear()
+
+    async def _fetch_schema_info(self, table_name: Optional[str] = None) -> Dict[str, Any]:
+        """Fetch schema information from information_schema (uncached)"""
         try:
             if self.db_type == "postgresql":
                 if table_name:
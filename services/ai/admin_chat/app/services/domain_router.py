@@ -3,6 +3,8 @@ Phase 4: Domain Router (Schema-Aware)
 Routes questions to appropriate domains using schema mapping for intelligent routing
 """
 
+import re
+
 from typing import Dict, Optional, Tuple
 from app.services.schema_mapper import schema_mapper
 
@@ -50,8 +52,34 @@ class DomainRouter:
         'permission', 'permissions', 'role assignment', 'wallet balance', 'rating', 'ratings'
     ]
     
+    # Compiled keyword alternations, built once at class load. These are
+    # plain substring alternations (no word boundaries) so they match
+    # exactly what the old `any(k in question)` loops matched, but each
+    # category check is one C-level scan of the question instead of a
+    # Python loop over the keyword list.
+    _HEALTHCARE_RE = re.compile('|'.join(
+        re.escape(k) for cat in HEALTHCARE_KEYWORDS.values() for k in cat
+    ))
+    _PROVIDER_RE = re.compile('|'.join(
+        re.escape(k) for k in HEALTHCARE_KEYWORDS['provider']
+    ))
+    _CLAIMS_RE = re.compile('|'.join(
+        re.escape(k) for k in HEALTHCARE_KEYWORDS['claims'] + HEALTHCARE_KEYWORDS['diagnosis']
+    ))
+    _ANALYTICS_RE = re.compile('|'.join(
+        re.escape(k) for k in HEALTHCARE_KEYWORDS['analytics']
+    ))
+    _OUT_OF_SCOPE_RE = re.compile('|'.join(
+        re.escape(k) for k in OUT_OF_SCOPE_KEYWORDS
+    ))
+
+    # Bounded memo of routing decisions; dashboards re-ask the same
+    # handful of questions, so repeats skip the keyword/schema scans
+    ROUTE_CACHE_MAX_ENTRIES = 256
+
     def __init__(self):
         self._initialized = False
+        self._route_cache: Dict[str, Tuple[str, Optional[str]]] = {}
     
     async def initialize(self):
         """Initialize schema mapper for intelligent routing"""
@@ -72,10 +100,28 @@ class DomainRouter:
             - rejection_reason: None if routed, error message if rejected
         """
         question_lower = question.lower()
-        
+
+        # Exact-match cache on the normalized question
+        cache_key = ' '.join(question_lower.split())
+        cached = self._route_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        result = self._route_uncached(question, question_lower)
+        if len(self._route_cache) >= self.ROUTE_CACHE_MAX_ENTRIES:
+            self._route_cache.clear()
+        self._route_cache[cache_key] = result
+        return result
+
+    def clear_route_cache(self):
+        """Drop memoized routing decisions (for tests and schema reloads)"""
+        self._route_cache.clear()
+
+    def _route_uncached(self, question: str, question_lower: str) -> Tuple[str, Optional[str]]:
+        """Keyword/schema routing logic behind the route() memo cache"""
         # Check for out-of-scope keywords (HR, payroll, credentials)
         # Only reject if it's clearly NOT about healthcare data
-        if any(keyword in question_lower for keyword in self.OUT_OF_SCOPE_KEYWORDS):
+        if self._OUT_OF_SCOPE_RE.search(question_lower):
             # Allow if it's in a healthcare context (e.g., "provider credentials" in healthcare context)
             if not self._is_healthcare_context(question_lower):
                 return (
@@ -115,26 +161,19 @@ class DomainRouter:
     
     def _has_healthcare_keywords(self, question: str) -> bool:
         """Check if question has any healthcare-related keywords"""
-        for category, keywords in self.HEALTHCARE_KEYWORDS.items():
-            if any(keyword in question for keyword in keywords):
-                return True
-        return False
-    
+        return bool(self._HEALTHCARE_RE.search(question))
+
     def _has_provider_keywords(self, question: str) -> bool:
         """Check if question mentions providers/facilities"""
-        provider_keywords = self.HEALTHCARE_KEYWORDS.get('provider', [])
-        return any(keyword in question for keyword in provider_keywords)
-    
+        return bool(self._PROVIDER_RE.search(question))
+
     def _has_claims_keywords(self, question: str) -> bool:
         """Check if question mentions claims/diagnoses"""
-        claims_keywords = self.HEALTHCARE_KEYWORDS.get('claims', [])
-        diagnosis_keywords = self.HEALTHCARE_KEYWORDS.get('diagnosis', [])
-        return any(keyword in question for keyword in claims_keywords + diagnosis_keywords)
-    
+        return bool(self._CLAIMS_RE.search(question))
+
     def _has_analytics_keywords(self, question: str) -> bool:
         """Check if question has analytics/query keywords"""
-        analytics_keywords = self.HEALTHCARE_KEYWORDS.get('analytics', [])
-        return any(keyword in question for keyword in analytics_keywords)
+        return bool(self._ANALYTICS_RE.search(question))
     
     def _is_healthcare_context(self, question: str) -> bool:
         """
@@ -3,7 +3,7 @@ Domain 3.6: Evaluation & KPIs
 Objectively measure system quality
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import json
 from pathlib import Path
@@ -22,19 +22,38 @@ class EvaluationMetrics:
     def record_query_metric(self, metric_type: str, value: Any, metadata: Optional[Dict] = None):
         """
         Record a query metric
-        
+
         Args:
             metric_type: Type of metric (sql_validity, answer_correctness, join_accuracy, etc.)
             value: Metric value
             metadata: Additional metadata
         """
-        metric_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'metric_type': metric_type,
-            'value': value,
-            'metadata': metadata or {}
-        }
-        
+        self.record_batch([(metric_type, value, metadata)])
+
+    def record_batch(self, entries: List[Tuple[str, Any, Optional[Dict]]]):
+        """
+        Record several metrics with a single load/save of the metrics file
+
+        A request records up to four metrics; batching them pays one file
+        rewrite instead of one per metric.
+
+        Args:
+            entries: List of (metric_type, value, metadata) tuples
+        """
+        if not entries:
+            return
+
+        timestamp = datetime.now().isoformat()
+        new_entries = [
+            {
+                'timestamp': timestamp,
+                'metric_type': metric_type,
+                'value': value,
+                'metadata': metadata or {}
+            }
+            for metric_type, value, metadata in entries
+        ]
+
         # Load existing metrics
         metrics_list = []
         if self._metrics_file.exists():
@@ -43,14 +62,14 @@ class EvaluationMetrics:
                     metrics_list = json.load(f)
             except:
                 metrics_list = []
-        
-        # Add new metric
-        metrics_list.append(metric_entry)
-        
+
+        # Add new metrics
+        metrics_list.extend(new_entries)
+
         # Keep only last 10000 entries
         if len(metrics_list) > 10000:
             metrics_list = metrics_list[-10000:]
-        
+
         # Save
         try:
             with open(self._metrics_file, 'w') as f:
@@ -2,6 +2,7 @@
 Phase 2: Intent Classifier for Clinical Claims & Diagnosis Domain
 Maps natural language questions to canonical intents
 """
+from functools import lru_cache
 from typing import Literal, Dict, Any, Optional
 import re
 
@@ -67,13 +68,18 @@ class IntentClassifier:
         r'\butilization\b'
     ]
     
+    @lru_cache(maxsize=4096)
     def classify_intent(self, query: str) -> Literal["FREQUENCY_VOLUME", "TREND_TIME_SERIES", "COST_FINANCIAL", "SERVICE_UTILIZATION", "UNKNOWN"]:
         """
         Classify query into canonical intent
-        
+
+        Classification is a pure function of the query string, so results
+        are memoized; repeats (retries, cached-generation paths) skip the
+        pattern scans.
+
         Args:
             query: Natural language query
-            
+
         Returns:
             Canonical intent type
         """
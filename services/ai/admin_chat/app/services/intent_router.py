@@ -2,10 +2,32 @@
 Intent Router Service
 Classifies user queries as [DATA] or [CHAT] and routes to appropriate handler
 """
-from typing import Literal
+import asyncio
+import re
+import time
+from typing import Dict, Literal, Optional, Tuple
 from app.services.llm_client import llm_client
 from app.core.config import settings
 
+# Normalization for the classification cache key: lowercase, strip
+# punctuation, collapse whitespace so paraphrases with different spacing
+# or punctuation share an entry
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_WS_RE = re.compile(r"\s+")
+
+# Lexical pre-classifier: one regex scan decides the dominant classes
+# without touching the cache or the LLM. CHAT markers are checked first
+# so greetings that mention data words ("hi, can you help with claims?")
+# still get the full classifier
+_DATA_RE = re.compile(
+    r"\b(show|list|count|top|sum|avg|how many|group by|claims?|users?|state|status)\b",
+    re.IGNORECASE
+)
+_CHAT_RE = re.compile(
+    r"\b(hi|hello|thanks|who are you|help|what can you)\b",
+    re.IGNORECASE
+)
+
 
 class IntentRouter:
     """
@@ -67,18 +89,96 @@ IMPORTANT RULES:
 
 Be friendly, professional, and helpful."""
 
+    # Classification cache: admin workloads repeat heavily, so cached
+    # intents make repeated queries skip the LLM fallback entirely
+    CACHE_TTL = 3600  # 1 hour
+    CACHE_MAX_ENTRIES = 10000
+
+    def __init__(self):
+        self._intent_cache: Dict[str, Tuple[str, float]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _normalize(user_query: str) -> str:
+        """Normalize a query into a cache key (lowercase, no punctuation)"""
+        return _WS_RE.sub(" ", _PUNCT_RE.sub(" ", user_query.lower())).strip()
+
+    @staticmethod
+    def fast_classify(user_query: str) -> Optional[Literal["DATA", "CHAT"]]:
+        """
+        Cheap lexical classification for the dominant query classes
+
+        Two precompiled regex scans decide obvious DATA/CHAT queries in
+        sub-microsecond time; ambiguous queries return None so the caller
+        falls through to the full (cached/LLM) classifier.
+
+        Args:
+            user_query: User's input query
+
+        Returns:
+            "DATA", "CHAT", or None if the query is ambiguous
+        """
+        if not user_query:
+            return None
+        if _CHAT_RE.search(user_query):
+            return None if _DATA_RE.search(user_query) else "CHAT"
+        if _DATA_RE.search(user_query):
+            return "DATA"
+        return None
+
     async def classify_intent(self, user_query: str) -> Literal["DATA", "CHAT"]:
         """
-        Classify user query intent
-        
+        Classify user query intent, caching results per normalized query
+
+        Repeated or lightly-paraphrased queries hit the cache and never
+        reach the LLM. Concurrent misses on the same key share a single
+        in-flight classification (singleflight) to avoid stampedes.
+
         Args:
             user_query: User's input query
-        
+
         Returns:
             "DATA" for database queries, "CHAT" for general conversation
         """
         if not user_query or not user_query.strip():
             return "CHAT"
+
+        cache_key = self._normalize(user_query)
+        cached = self._intent_cache.get(cache_key)
+        if cached and (time.time() - cached[1]) < self.CACHE_TTL:
+            return cached[0]
+
+        # Singleflight: if this key is already being classified, await it
+        pending = self._inflight.get(cache_key)
+        if pending is not None:
+            return await pending
+
+        future: asyncio.Future = asyncio.get_event_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            intent = await self._classify_uncached(user_query)
+            if len(self._intent_cache) >= self.CACHE_MAX_ENTRIES:
+                self._intent_cache.clear()
+            self._intent_cache[cache_key] = (intent, time.time())
+            future.set_result(intent)
+            return intent
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved in case no one else is waiting
+            raise
+        finally:
+            self._inflight.pop(cache_key, None)
+
+    async def _classify_uncached(self, user_query: str) -> Literal["DATA", "CHAT"]:
+        """
+        Classify user query intent (uncached)
+
+        Args:
+            user_query: User's input query
+
+        Returns:
+            "DATA" for database queries, "CHAT" for general conversation
+        """
         
         query_lower = user_query.lower().strip()
         
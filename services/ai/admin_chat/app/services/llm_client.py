@@ -5,7 +5,7 @@ LLM Client Service - Interface to RunPod GPU LLM for SQL generation
 import aiohttp
 import json
 import asyncio
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, AsyncIterator, Tuple
 from app.core.config import settings
 
 
@@ -165,14 +165,48 @@ class LLMClient:
         stop: Optional[list] = None
     ) -> str:
         """
-        Generate text using RunPod or Groq API with automatic fallback
-        
+        Generate text from a single prompt string
+
+        Convenience wrapper around chat() for callers that build one flat
+        prompt (SQL generation, insights).
+
         Args:
             prompt: Input prompt
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
             stop: Stop sequences
-        
+
+        Returns:
+            Generated text
+        """
+        return await self.chat(
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+
+    async def chat(
+        self,
+        messages: list,
+        temperature: float = 0.1,
+        max_tokens: int = 2000,
+        stop: Optional[list] = None
+    ) -> str:
+        """
+        Generate a response from a native chat message list using RunPod or
+        Groq API with automatic fallback
+
+        Both providers are OpenAI-compatible, so role-structured messages
+        are posted as-is; callers don't need to flatten history into a
+        "User:/Assistant:" string.
+
+        Args:
+            messages: List of {"role": ..., "content": ...} dicts
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            stop: Stop sequences
+
         Returns:
             Generated text
         """
@@ -188,9 +222,7 @@ class LLMClient:
         
         payload = {
             "model": self.model,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
+            "messages": messages,
             "max_tokens": max_tokens,
             "temperature": temperature,
             "top_p": 0.9,
@@ -246,6 +278,106 @@ class LLMClient:
         provider_name = "RunPod" if self.provider == "runpod" else "Groq"
         raise RuntimeError(f"Error generating text: {provider_name} API failed after {max_retries} attempts. Last error: {last_error}")
 
+    async def stream(
+        self,
+        messages: list,
+        temperature: float = 0.1,
+        max_tokens: int = 2000,
+        stop: Optional[list] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion as it is generated
+
+        Posts the same OpenAI-compatible payload as chat() with
+        stream=True and yields delta.content chunks as the provider emits
+        them, so callers can forward tokens to the client instead of
+        buffering the full reply. If the initial connection fails on
+        RunPod (nothing yielded yet), the request is retried once on the
+        first Groq model; there is no per-model retry loop mid-stream
+        because partial output may already have been sent.
+
+        Args:
+            messages: List of {"role": ..., "content": ...} dicts
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            stop: Stop sequences
+
+        Yields:
+            Generated text chunks, in order
+        """
+        if not self.api_key:
+            provider_name = "RunPod" if self.provider == "runpod" else "Groq"
+            raise ValueError(f"{provider_name}_API_KEY is not set")
+
+        # Build API URL
+        if "/chat/completions" in self.base_url:
+            api_url = self.base_url
+        else:
+            api_url = f"{self.base_url.rstrip('/')}/chat/completions"
+
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": 0.9,
+            "stop": stop or [],
+            "stream": True
+        }
+
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            async with session.post(api_url, json=payload, headers=headers) as response:
+                if response.status == 200:
+                    async for chunk in self._iter_sse_content(response):
+                        yield chunk
+                    return
+
+                error_text = await response.text()
+
+            # Connection-time failure on RunPod: nothing has been yielded
+            # yet, so it is safe to retry the whole stream on Groq
+            if self.provider == "runpod" and self._switch_to_groq():
+                print(f"⚠️ RunPod stream error {response.status}. Switching to Groq fallback...")
+                api_url = f"{self.base_url.rstrip('/')}/chat/completions"
+                payload["model"] = self.model
+                headers["Authorization"] = f"Bearer {self.api_key}"
+
+                async with session.post(api_url, json=payload, headers=headers) as groq_response:
+                    if groq_response.status != 200:
+                        groq_error = await groq_response.text()
+                        raise RuntimeError(f"Groq stream error {groq_response.status}: {groq_error[:500]}")
+                    async for chunk in self._iter_sse_content(groq_response):
+                        yield chunk
+                return
+
+            raise RuntimeError(f"Stream error {response.status}: {error_text[:500]}")
+
+    @staticmethod
+    async def _iter_sse_content(response) -> AsyncIterator[str]:
+        """Yield delta.content chunks from an OpenAI-compatible SSE response"""
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8", errors="ignore").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                yield content
+
 
 # ============================================================================
 # OLD RUNPOD GPU CODE (COMMENTED OUT - Using Groq API instead)
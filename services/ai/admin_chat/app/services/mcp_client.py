@@ -26,16 +26,23 @@ class MCPClient:
     """
     
     def __init__(self):
-        self._initialized = False
-    
+        self._init_once: Optional[asyncio.Future] = None
+
     async def initialize(self):
-        """Initialize MCP client and underlying services"""
-        if self._initialized:
-            return
-        
+        """
+        Initialize MCP client and underlying services (once per process)
+
+        Concurrent callers share a single in-flight initialization; once
+        it completes, later calls return after one cheap future await.
+        """
+        if self._init_once is None:
+            self._init_once = asyncio.ensure_future(self._do_init())
+        await self._init_once
+
+    async def _do_init(self):
+        """Perform the actual one-time initialization"""
         # Initialize database connection
         await database_service.initialize()
-        self._initialized = True
     
     async def generate_sql(
         self,
@@ -5,6 +5,8 @@ Mandatory post-processing to hide IDs, foreign keys, and rename columns
 
 from typing import List, Dict, Any, Optional
 
+from app.services.safety_governance import safety_governance
+
 
 class ResultSanitizer:
     """
@@ -45,27 +47,32 @@ class ResultSanitizer:
         'hospital': 'Hospital',
     }
     
-    def sanitize(self, results: List[Dict[str, Any]], sql: str) -> List[Dict[str, Any]]:
+    def sanitize(
+        self,
+        results: List[Dict[str, Any]],
+        sql: str,
+        pii_columns: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Sanitize query results to hide IDs and rename columns.
-        
+
+        When `pii_columns` is provided, PII values are masked in the same
+        pass, so large result sets are walked once instead of twice.
+
         Args:
             results: Raw SQL query results
             sql: Original SQL query (for context)
-            
+            pii_columns: PII columns found in the SQL; truthy enables
+                inline masking (same semantics as mask_pii_in_results)
+
         Returns:
-            Sanitized results with IDs hidden and columns renamed
+            Sanitized results with IDs hidden, columns renamed, and PII masked
         """
         if not results:
             return results
-        
-        # Get column names from first row
-        if not results:
-            return results
-        
-        first_row = results[0]
-        columns = list(first_row.keys())
-        
+
+        mask_pii = bool(pii_columns)
+
         # Build sanitized results
         sanitized = []
         for row in results:
@@ -74,13 +81,19 @@ class ResultSanitizer:
                 # Skip hidden columns
                 if self._should_hide_column(col):
                     continue
-                
+
                 # Rename column to business label
                 new_col_name = self._rename_column(col)
+
+                # Mask PII inline (checked against the renamed label, which
+                # is what the second masking pass used to see)
+                if mask_pii and value and safety_governance.is_pii_column(new_col_name):
+                    value = safety_governance.mask_value(value)
+
                 sanitized_row[new_col_name] = value
-            
+
             sanitized.append(sanitized_row)
-        
+
         return sanitized
     
     def _should_hide_column(self, column_name: str) -> bool:
@@ -3,6 +3,7 @@ Domain 3.2: Safety, Permissions & Data Governance
 Prevents unauthorized or dangerous data access
 """
 
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple, Set
 import re
 
@@ -37,7 +38,27 @@ class SafetyGovernance:
             'diagnoses', 'services'  # Aggregated views only
         ]
     }
-    
+
+    # Lowercased frozenset views of the allowlists, built once so the
+    # per-request check is a hash lookup instead of a nested list scan
+    _ROLE_TABLE_SETS = {
+        role: frozenset(t.lower() for t in tables)
+        for role, tables in ROLE_TABLE_ACCESS.items()
+        if tables != '*'
+    }
+
+    # Single alternation over all PII column names; one scan of the SQL
+    # replaces a regex search per column
+    _PII_RE = re.compile(r"\b(" + "|".join(PII_COLUMNS) + r")\b", re.IGNORECASE)
+
+    # Context keywords for the analyst users/states special case
+    _STATE_QUERY_RE = re.compile(
+        r"zamfara|kano|kogi|kaduna|fct|abuja|adamawa|sokoto|rivers|osun|lagos|state"
+    )
+    _USER_DETAIL_RE = re.compile(
+        r"user details|user information|user profile|which user|who is the user"
+    )
+
     def check_role_permissions(self, user_role: str, tables: List[str], query: str = "") -> Tuple[bool, Optional[str]]:
         """
         Check if user role has permission to access tables
@@ -59,93 +80,92 @@ class SafetyGovernance:
         if allowed_tables == '*':
             return (True, None)
         
-        # For analyst role: Allow users/states tables ONLY for state filtering (not for user details)
-        query_lower = query.lower() if query else ""
-        is_state_query = any(state in query_lower for state in [
-            'zamfara', 'kano', 'kogi', 'kaduna', 'fct', 'abuja', 'adamawa',
-            'sokoto', 'rivers', 'osun', 'lagos', 'state', 'states'
-        ])
-        is_user_detail_query = any(keyword in query_lower for keyword in [
-            'user details', 'user information', 'user profile', 'which user', 'who is the user'
-        ])
-        
-        # Check if all requested tables are allowed
+        allowed_set = self._ROLE_TABLE_SETS[user_role]
+
+        # Check if all requested tables are allowed; the query context for
+        # the analyst users/states special case (state filtering allowed,
+        # user detail lookups not) is only computed if a table misses
+        is_state_query = None
+        is_user_detail_query = False
         for table in tables:
             table_lower = table.lower()
-            if table_lower not in [t.lower() for t in allowed_tables]:
-                # Special case: users/states for state filtering
-                if user_role == 'analyst' and table_lower in ['users', 'states']:
-                    if is_state_query and not is_user_detail_query:
-                        continue  # Allow users/states for state filtering
-                    else:
-                        return (
-                            False,
-                            f"Role '{user_role}' does not have permission to access table '{table}' for user details. "
-                            f"State filtering is allowed, but user detail queries are restricted."
-                        )
-                
+            if table_lower in allowed_set:
+                continue
+
+            # Special case: users/states for state filtering
+            if user_role == 'analyst' and table_lower in ('users', 'states'):
+                if is_state_query is None:
+                    query_lower = query.lower() if query else ""
+                    is_state_query = bool(self._STATE_QUERY_RE.search(query_lower))
+                    is_user_detail_query = bool(self._USER_DETAIL_RE.search(query_lower))
+                if is_state_query and not is_user_detail_query:
+                    continue  # Allow users/states for state filtering
                 return (
                     False,
-                    f"Role '{user_role}' does not have permission to access table '{table}'. "
-                    f"Allowed tables: {', '.join(allowed_tables)}"
+                    f"Role '{user_role}' does not have permission to access table '{table}' for user details. "
+                    f"State filtering is allowed, but user detail queries are restricted."
                 )
-        
+
+            return (
+                False,
+                f"Role '{user_role}' does not have permission to access table '{table}'. "
+                f"Allowed tables: {', '.join(allowed_tables)}"
+            )
+
         return (True, None)
     
     def identify_pii_columns(self, sql: str, schema_info: Optional[Dict] = None) -> List[str]:
         """
         Identify PII columns in SQL query
-        
+
         Returns:
             List of PII column names found
         """
         if not sql:
             return []
-        sql_upper = sql.upper()
-        found_pii = []
-        
-        for pii_col in self.PII_COLUMNS:
-            # Check for column in SELECT clause
-            pattern = rf'\b{pii_col}\b'
-            if re.search(pattern, sql_upper, re.IGNORECASE):
-                found_pii.append(pii_col)
-        
-        return found_pii
+        return list(self._identify_pii_cached(sql))
+
+    @lru_cache(maxsize=2048)
+    def _identify_pii_cached(self, sql: str) -> Tuple[str, ...]:
+        """Memoized PII scan: one pass with the precompiled alternation
+        instead of one regex search per PII column, cached per SQL string
+        (the scan is a pure function of the SQL)"""
+        found = {m.group(1).lower() for m in self._PII_RE.finditer(sql)}
+        return tuple(col for col in self.PII_COLUMNS if col in found)
     
+    def is_pii_column(self, column_name: str) -> bool:
+        """Check if a column name refers to PII"""
+        col_lower = column_name.lower()
+        return any(pii in col_lower for pii in self.PII_COLUMNS)
+
+    def mask_value(self, value) -> str:
+        """Mask a single PII value (emails keep their shape, long strings
+        keep the last 4 characters)"""
+        if isinstance(value, str):
+            if '@' in value:  # Email
+                return '***@***.***'
+            if len(value) > 4:  # Phone, NIMC, etc.
+                return '***' + value[-4:]
+        return '***'
+
     def mask_pii_in_results(self, results: List[Dict], pii_columns: List[str]) -> List[Dict]:
         """
         Mask PII columns in query results
-        
+
         Returns:
             Results with PII columns masked
         """
         if not results or not pii_columns:
             return results
-        
+
         masked_results = []
         for row in results:
-            masked_row = {}
-            for col, value in row.items():
-                col_lower = col.lower()
-                # Check if column contains PII
-                is_pii = any(pii in col_lower for pii in self.PII_COLUMNS)
-                
-                if is_pii and value:
-                    # Mask the value
-                    if isinstance(value, str):
-                        if '@' in value:  # Email
-                            masked_row[col] = '***@***.***'
-                        elif len(value) > 4:  # Phone, NIMC, etc.
-                            masked_row[col] = '***' + value[-4:]
-                        else:
-                            masked_row[col] = '***'
-                    else:
-                        masked_row[col] = '***'
-                else:
-                    masked_row[col] = value
-            
+            masked_row = {
+                col: self.mask_value(value) if value and self.is_pii_column(col) else value
+                for col, value in row.items()
+            }
             masked_results.append(masked_row)
-        
+
         return masked_results
     
     def validate_query_safety(self, sql: str) -> Tuple[bool, Optional[str]]:
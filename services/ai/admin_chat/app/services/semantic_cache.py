@@ -0,0 +1,126 @@
+"""
+Semantic Response Cache
+Full-response cache for the admin query pipeline
+
+Where sql_cache skips only the LLM generation step, this cache stores the
+complete response payload (rows, visualization, insight), so a repeated or
+paraphrased question skips the entire pipeline: generation, validation,
+execution, sanitization, and the insight LLM call.
+
+Paraphrase tolerance comes from the same normalized token-signature scheme
+sql_cache uses; an embedding index would catch more rewordings, but this
+service has no embedding dependency and admin dashboards mostly repeat a
+small set of near-identical questions. Time-sensitive questions ("today",
+"this month", ...) are never cached since their answers drift.
+"""
+import hashlib
+import re
+import time
+from typing import Any, Dict, Optional
+
+
+class SemanticResponseCache:
+    """
+    Caches complete response payloads keyed by a normalized query signature
+
+    Entries are scoped by the caller-supplied scope string — user role plus
+    any request flags that change the payload's shape (e.g. include_table)
+    — so role-restricted answers are never served across permission levels
+    and a payload built for one response shape is never reused for another.
+    Entries expire after a short TTL so cached aggregates don't drift too
+    far from the live data.
+    """
+
+    # Questions about moving time windows produce answers that change as
+    # the clock ticks; never cache them
+    _TIME_SENSITIVE_RE = re.compile(
+        r"\b(today|yesterday|now|current|recent|latest|this (week|month|year)|"
+        r"last (week|month|year|\d+ (days?|weeks?|months?)))\b"
+    )
+
+    # Same normalization as sql_cache: drop filler words, sort tokens
+    _STOPWORDS = frozenset({
+        "a", "an", "the", "me", "my", "please", "can", "you", "i", "we",
+        "of", "for", "to", "in", "on", "is", "are", "was", "were", "do",
+        "does", "what", "show", "give", "tell", "get", "display", "list"
+    })
+    _LITERAL_RE = re.compile(r"'[^']*'|\"[^\"]*\"|\b\d+(?:\.\d+)?\b")
+    _TOKEN_RE = re.compile(r"[a-z0-9<>]+")
+
+    def __init__(self, ttl_seconds: int = 600, max_entries: int = 500):
+        """
+        Args:
+            ttl_seconds: Time to live for cached responses
+            max_entries: Maximum entries before oldest are evicted
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._responses: Dict[str, Dict[str, Any]] = {}
+
+    def _signature(self, query: str, scope: str) -> str:
+        """Build a normalized signature for a natural language query"""
+        normalized = self._LITERAL_RE.sub("<LIT>", query.lower())
+        tokens = [
+            token for token in self._TOKEN_RE.findall(normalized)
+            if token not in self._STOPWORDS
+        ]
+        tokens.sort()
+        key_material = f"{scope}:{' '.join(tokens)}"
+        return hashlib.md5(key_material.encode()).hexdigest()
+
+    def is_cacheable(self, query: str) -> bool:
+        """True unless the query asks about a moving time window"""
+        return not self._TIME_SENSITIVE_RE.search(query.lower())
+
+    async def lookup(self, query: str, scope: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response payload for a query
+
+        Args:
+            query: Natural language question
+            scope: Caller scope (e.g. user role)
+
+        Returns:
+            The cached payload dict on a hit, None on miss or expiry
+        """
+        if not self.is_cacheable(query):
+            return None
+
+        key = self._signature(query, scope)
+        entry = self._responses.get(key)
+        if not entry:
+            return None
+
+        if time.time() - entry["cached_at"] > self.ttl_seconds:
+            self._responses.pop(key, None)
+            return None
+
+        return entry["payload"]
+
+    async def store(self, query: str, payload: Dict[str, Any], scope: str = ""):
+        """Store a successful response payload (skipped for time-sensitive queries)"""
+        if not self.is_cacheable(query):
+            return
+
+        key = self._signature(query, scope)
+        self._evict_if_full()
+        self._responses[key] = {
+            "cached_at": time.time(),
+            "payload": payload
+        }
+
+    def _evict_if_full(self):
+        """Evict the oldest entries when the cache exceeds max_entries"""
+        if len(self._responses) < self.max_entries:
+            return
+        oldest = sorted(self._responses.items(), key=lambda item: item[1]["cached_at"])
+        for key, _ in oldest[:len(self._responses) - self.max_entries + 1]:
+            self._responses.pop(key, None)
+
+    def clear(self):
+        """Clear all cached responses (e.g. after schema changes)"""
+        self._responses.clear()
+
+
+# Global instance
+semantic_cache = SemanticResponseCache()
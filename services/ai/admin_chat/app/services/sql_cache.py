@@ -0,0 +1,151 @@
+"""
+SQL Generation Cache
+In-process intent-signature cache for NL→SQL generation results
+
+Paraphrases of the same admin question normalize to the same signature,
+so repeated questions skip the LLM roundtrip entirely. A second, short-lived
+cache keyed by the generated SQL avoids re-executing identical queries.
+"""
+import hashlib
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+
+class SQLGenerationCache:
+    """
+    Caches generated SQL keyed by a normalized intent signature
+
+    Signature building:
+    - lowercase and collapse whitespace
+    - replace numeric and quoted literals with <LIT>
+    - drop stopwords and sort the remaining tokens
+
+    Entries are namespaced by schema_version so schema changes invalidate
+    cached SQL, and expire after a TTL.
+    """
+
+    # Common filler words that don't change query intent
+    _STOPWORDS = frozenset({
+        "a", "an", "the", "me", "my", "please", "can", "you", "i", "we",
+        "of", "for", "to", "in", "on", "is", "are", "was", "were", "do",
+        "does", "what", "show", "give", "tell", "get", "display", "list"
+    })
+    _LITERAL_RE = re.compile(r"'[^']*'|\"[^\"]*\"|\b\d+(?:\.\d+)?\b")
+    _TOKEN_RE = re.compile(r"[a-z0-9<>]+")
+
+    def __init__(self, ttl_seconds: int = 3600, result_ttl_seconds: int = 60, max_entries: int = 2000):
+        """
+        Args:
+            ttl_seconds: Time to live for cached SQL generations
+            result_ttl_seconds: Time to live for cached query results
+            max_entries: Maximum entries per cache before oldest are evicted
+        """
+        self.ttl_seconds = ttl_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_entries = max_entries
+        self._generations: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+
+    def _signature(self, query: str, schema_version: str, scope: str = "") -> str:
+        """Build a normalized intent signature for a natural language query"""
+        normalized = self._LITERAL_RE.sub("<LIT>", query.lower())
+        tokens = [
+            token for token in self._TOKEN_RE.findall(normalized)
+            if token not in self._STOPWORDS
+        ]
+        tokens.sort()
+        key_material = f"{schema_version}:{scope}:{' '.join(tokens)}"
+        return hashlib.md5(key_material.encode()).hexdigest()
+
+    async def lookup(
+        self,
+        query: str,
+        schema_version: str = "",
+        scope: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached SQL generation for a query
+
+        Args:
+            query: Natural language question
+            schema_version: Namespace for schema invalidation
+            scope: Caller scope (e.g. user role) so entries cached under
+                one role's permissions are never served to another
+
+        Returns:
+            Dictionary with 'sql', 'explanation', 'confidence', 'source' on hit,
+            None on miss or expired entry
+        """
+        key = self._signature(query, schema_version, scope)
+        entry = self._generations.get(key)
+        if not entry:
+            return None
+
+        if time.time() - entry["cached_at"] > self.ttl_seconds:
+            self._generations.pop(key, None)
+            return None
+
+        return entry["value"]
+
+    async def store(
+        self,
+        query: str,
+        sql: str,
+        explanation: str,
+        confidence: float,
+        source: str = "legacy",
+        schema_version: str = "",
+        scope: str = ""
+    ):
+        """Store a validated, successfully executed SQL generation"""
+        key = self._signature(query, schema_version, scope)
+        self._evict_if_full(self._generations)
+        self._generations[key] = {
+            "cached_at": time.time(),
+            "value": {
+                "sql": sql,
+                "explanation": explanation,
+                "confidence": confidence,
+                "source": source
+            }
+        }
+
+    async def lookup_results(self, sql: str) -> Optional[List[Dict[str, Any]]]:
+        """Look up cached query results for identical generated SQL"""
+        key = hashlib.md5(sql.encode()).hexdigest()
+        entry = self._results.get(key)
+        if not entry:
+            return None
+
+        if time.time() - entry["cached_at"] > self.result_ttl_seconds:
+            self._results.pop(key, None)
+            return None
+
+        return entry["rows"]
+
+    async def store_results(self, sql: str, rows: List[Dict[str, Any]]):
+        """Cache query results keyed by the executed SQL"""
+        key = hashlib.md5(sql.encode()).hexdigest()
+        self._evict_if_full(self._results)
+        self._results[key] = {
+            "cached_at": time.time(),
+            "rows": rows
+        }
+
+    def _evict_if_full(self, cache: Dict[str, Dict[str, Any]]):
+        """Evict the oldest entries when a cache exceeds max_entries"""
+        if len(cache) < self.max_entries:
+            return
+        oldest = sorted(cache.items(), key=lambda item: item[1]["cached_at"])
+        for key, _ in oldest[:len(cache) - self.max_entries + 1]:
+            cache.pop(key, None)
+
+    def clear(self):
+        """Clear all cached entries (e.g. after schema changes)"""
+        self._generations.clear()
+        self._results.clear()
+
+
+# Global instance
+sql_cache = SQLGenerationCache()
@@ -21,6 +21,45 @@ except ImportError:
     vanna_service = None
 
 
+class SQLGenerationError(RuntimeError):
+    """Base class for SQL generation failures"""
+
+
+class SQLGenTimeout(SQLGenerationError):
+    """The LLM request timed out"""
+
+
+class SQLGenUnavailable(SQLGenerationError):
+    """The LLM service is down or returned a gateway error"""
+
+
+class SQLGenNetworkError(SQLGenerationError):
+    """A network error occurred while reaching the LLM service"""
+
+
+class SQLGenAllProvidersFailed(SQLGenerationError):
+    """Every configured LLM provider failed"""
+
+
+# Upstream errors are classified once here, at the raise site, so callers
+# dispatch by exception type instead of re-scanning message strings
+_FAILURE_RE = re.compile(
+    r"(?P<all_failed>All LLM providers failed|All Groq models failed)"
+    r"|(?P<unavailable>502|Bad Gateway|unavailable)"
+    r"|(?P<timeout>timed out|timeout)"
+    r"|(?P<network>Network error)",
+    re.IGNORECASE
+)
+
+# Checked in priority order (dict insertion order)
+_FAILURE_CLASSES = {
+    "all_failed": SQLGenAllProvidersFailed,
+    "unavailable": SQLGenUnavailable,
+    "timeout": SQLGenTimeout,
+    "network": SQLGenNetworkError,
+}
+
+
 class SQLGenerator:
     """
     Generates SQL queries from natural language using Vanna AI (with legacy fallback)
@@ -29,34 +68,50 @@ class SQLGenerator:
     1. Vanna AI (if enabled and available) - Better accuracy, RAG-based, learns from examples
     2. Legacy LLM-based generator - Fallback for compatibility
     """
-    
+
+    # Row cap appended to generated SQL that carries no LIMIT of its own
+    DEFAULT_ROW_CAP = 10000
+
     def __init__(self):
         self._schema_cache: Optional[Dict[str, Any]] = None
         self._cache_timestamp: Optional[float] = None
         self._cache_ttl: int = 3600  # Cache schema for 1 hour
+        self._schema_lock: Optional["asyncio.Lock"] = None
         self._vanna_initialized = False
-    
+
     async def _get_schema_info(self) -> Dict[str, Any]:
-        """Get database schema information (cached)"""
+        """Get database schema information (cached, stampede-safe)"""
+        import asyncio
         import time
-        
+
         # Return cached schema if still valid
         if self._schema_cache and self._cache_timestamp:
             if time.time() - self._cache_timestamp < self._cache_ttl:
                 return self._schema_cache
-        
+
         # Fetch fresh schema
         if not database_service.pool:
             return {}
-        
-        try:
-            schema_info = await database_service.get_schema_info()
-            self._schema_cache = schema_info
-            self._cache_timestamp = time.time()
-            return schema_info
-        except Exception as e:
-            print(f"Error fetching schema: {e}")
-            return self._schema_cache or {}
+
+        # Serialize concurrent refreshes so a cold/expired cache triggers
+        # one metadata fetch instead of one per in-flight request
+        if self._schema_lock is None:
+            self._schema_lock = asyncio.Lock()
+
+        async with self._schema_lock:
+            # Another waiter may have refreshed while we queued
+            if self._schema_cache and self._cache_timestamp:
+                if time.time() - self._cache_timestamp < self._cache_ttl:
+                    return self._schema_cache
+
+            try:
+                schema_info = await database_service.get_schema_info()
+                self._schema_cache = schema_info
+                self._cache_timestamp = time.time()
+                return schema_info
+            except Exception as e:
+                print(f"Error fetching schema: {e}")
+                return self._schema_cache or {}
     
     def _format_schema_for_prompt(self, schema_info: Dict[str, Any], query: str = "") -> str:
         """Format schema information for LLM prompt, prioritizing relevant tables"""
@@ -157,6 +212,19 @@ class SQLGenerator:
         schema_text += "=== END OF SCHEMA ===\n"
         return schema_text
     
+    # Static instruction prefix for the compact prompt. Kept byte-identical
+    # across requests (and retries) so OpenAI-compatible providers'
+    # automatic prefix caching can reuse it; everything query-dependent
+    # (schema subset, state filter, question) is appended after it
+    _COMPACT_PROMPT_PREFIX = """You are a MySQL SQL generator. Your ONLY output must be a valid SELECT statement. No explanations, no markdown, just SQL.
+
+Rules:
+- Diagnosis: JOIN diagnoses d ON d.id = CAST(c.diagnosis AS UNSIGNED) WHERE c.diagnosis REGEXP '^[0-9]+$'
+- State: JOIN users u ON c.user_id=u.id JOIN states s ON u.state=s.id
+- Use d.name for disease names, s.name for state names
+- "highest/most/top" = GROUP BY + ORDER BY DESC + LIMIT
+"""
+
     def _build_compact_prompt(self, query: str, schema_text: str) -> str:
         """Build a compact prompt for low-token environments"""
         # Minimal essential schema - only tables likely needed
@@ -178,15 +246,8 @@ class SQLGenerator:
                 state_filter = f"State filter: WHERE s.name LIKE '%{state.title()}%'"
                 break
         
-        return f"""You are a MySQL SQL generator. Your ONLY output must be a valid SELECT statement. No explanations, no markdown, just SQL.
-
+        return f"""{self._COMPACT_PROMPT_PREFIX}
 Schema: {mini_schema.strip(', ')}
-
-Rules:
-- Diagnosis: JOIN diagnoses d ON d.id = CAST(c.diagnosis AS UNSIGNED) WHERE c.diagnosis REGEXP '^[0-9]+$'
-- State: JOIN users u ON c.user_id=u.id JOIN states s ON u.state=s.id  
-- Use d.name for disease names, s.name for state names
-- "highest/most/top" = GROUP BY + ORDER BY DESC + LIMIT
 {state_filter}
 
 Question: {query}
@@ -985,6 +1046,19 @@ SQL Query:"""
         
         return sql
     
+    def _apply_row_cap(self, sql: str) -> str:
+        """Append a LIMIT to SELECTs that have none, bounding rows transferred"""
+        if not sql:
+            return sql
+
+        if re.search(r'\bLIMIT\s+\d+', sql, re.IGNORECASE):
+            return sql
+
+        if not re.match(r'\s*SELECT\b', sql, re.IGNORECASE):
+            return sql
+
+        return f"{sql.rstrip().rstrip(';')} LIMIT {self.DEFAULT_ROW_CAP}"
+
     async def _initialize_vanna_if_needed(self):
         """Initialize Vanna AI if enabled and not already initialized"""
         if not settings.USE_VANNA_AI or not VANNA_SERVICE_AVAILABLE:
@@ -1007,19 +1081,22 @@ SQL Query:"""
     async def generate_sql(
         self,
         natural_language_query: str,
-        conversation_history: Optional[List[Dict[str, str]]] = None
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        schema: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Generate SQL query from natural language
-        
+
         Priority:
         1. Try Vanna AI (if enabled)
         2. Fallback to legacy LLM-based generator
-        
+
         Args:
             natural_language_query: User's question in natural language
             conversation_history: Previous conversation messages for context
-        
+            schema: Optional schema override (skips the database lookup;
+                used by test mode to inject a mock schema)
+
         Returns:
             Dictionary with 'sql', 'explanation', and 'confidence'
         """
@@ -1327,7 +1404,7 @@ SQL Query:"""
                 }
             
             # Get schema information (for disease/diagnosis queries or if fast-path didn't match)
-            schema_info = await self._get_schema_info()
+            schema_info = schema if schema is not None else await self._get_schema_info()
             schema_text = self._format_schema_for_prompt(schema_info, natural_language_query)
             
             # Build prompt
@@ -1354,10 +1431,13 @@ SQL Query:"""
             
             # Phase 2: Validate semantic contract rules
             sql = self._validate_phase2_semantic(sql, natural_language_query, intent)
-            
+
             # Guard against None SQL
             if not sql:
                 raise ValueError("SQL generation returned empty result")
+
+            # Cap uncapped queries so unbounded result sets can't flood the wire
+            sql = self._apply_row_cap(sql)
             
             # Generate explanation
             explanation = f"This query retrieves data to answer: {natural_language_query}"
@@ -1400,8 +1480,15 @@ SQL Query:"""
             
             return result
             
+        except SQLGenerationError:
+            raise
         except Exception as e:
-            raise RuntimeError(f"Failed to generate SQL: {str(e)}")
+            detail = str(e)
+            kinds = {m.lastgroup for m in _FAILURE_RE.finditer(detail)}
+            for kind, exc_class in _FAILURE_CLASSES.items():
+                if kind in kinds:
+                    raise exc_class(f"Failed to generate SQL: {detail}") from e
+            raise SQLGenerationError(f"Failed to generate SQL: {detail}") from e
 
 
 # Global instance
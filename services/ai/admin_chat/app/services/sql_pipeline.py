@@ -0,0 +1,329 @@
+"""
+SQL Pipeline Helpers
+Shared SQL generation/execution retry logic with upstream-error classification
+
+Extracted from the duplicated retry blocks in the admin query handlers so
+there is a single source of truth for retries and user-facing error copy.
+"""
+import asyncio
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.services.database_service import database_service
+from app.services.sql_cache import sql_cache
+from app.services.sql_generator import (
+    SQLGenAllProvidersFailed,
+    SQLGenNetworkError,
+    SQLGenTimeout,
+    SQLGenUnavailable,
+    sql_generator,
+)
+
+
+# User-facing copy for non-retryable upstream failures, keyed by error kind
+_USER_FACING_ERRORS = {
+    "all_failed": (
+        "All AI services are currently unavailable. "
+        "RunPod: GPU pod not running vLLM server. "
+        "Groq: All models blocked at project level. "
+        "Please start vLLM on RunPod or enable Groq models at https://console.groq.com/settings/project/limits"
+    ),
+    "unavailable": (
+        "The AI service (RunPod GPU) is currently unavailable. "
+        "The GPU pod may be down or restarting. Please try again in a few minutes. "
+        "If the issue persists, check your RunPod pod status."
+    ),
+    "timeout": (
+        "The AI service request timed out after 30+ seconds. "
+        "This may happen with complex queries. Try: "
+        "1) Simplifying your query (e.g., 'claims by status' instead of long descriptions), "
+        "2) Waiting a moment and retrying, "
+        "3) Breaking complex queries into smaller parts."
+    ),
+    "network": (
+        "Network error connecting to the AI service. "
+        "Please check your internet connection and try again."
+    ),
+}
+
+# Error kinds that should abort the generation retry loop immediately
+_NON_RETRYABLE_KINDS = frozenset({"all_failed", "unavailable", "timeout", "network"})
+
+# One precompiled scan classifies upstream failures instead of repeated
+# substring probes and .lower() allocations per exception
+_ERROR_RE = re.compile(
+    r"(?P<all_failed>All LLM providers failed)"
+    r"|(?P<unavailable>502|Bad Gateway|unavailable)"
+    r"|(?P<timeout>timeout)"
+    r"|(?P<network>Network error)"
+    r"|(?P<column>unknown column|\bcolumn\b)",
+    re.IGNORECASE
+)
+
+# Dispatch priority when a message matches several kinds
+_ERROR_KIND_PRIORITY = ("all_failed", "unavailable", "timeout", "network", "column")
+
+# Typed generator failures map straight to an error kind; the regex scan in
+# classify_error stays as the fallback for untyped upstream errors
+_EXCEPTION_KINDS = {
+    SQLGenAllProvidersFailed: "all_failed",
+    SQLGenUnavailable: "unavailable",
+    SQLGenTimeout: "timeout",
+    SQLGenNetworkError: "network",
+}
+
+# Retry-guidance templates, built once at import instead of re-assembling
+# the (large, static) guidance text on every failed attempt
+_RETRY_SQL_TMPL = (
+    "{query}\n\n"
+    "PREVIOUS ATTEMPT FAILED: {err}\n"
+    "Please correct the SQL query. Make sure to:\n"
+    "- Use only columns that exist in the schema\n"
+    "- Check relationships between tables (e.g., claims.user_id -> users.id)\n"
+    "- If querying by state, join through users table: claims -> users -> state"
+)
+
+_COLUMN_ERR_TMPL = (
+    "{query}\n\n"
+    "ERROR CONTEXT: The previous SQL query failed with error: {err}\n"
+    "SQL that failed: {sql}\n"
+    "Please generate a corrected SQL query. Make sure:\n"
+    "- All column names exist in the schema\n"
+    "- Use proper table relationships (e.g., claims.user_id -> users.id)\n"
+    "- Check the schema carefully before using any column"
+)
+
+
+# Singleflight: concurrent identical work shares one in-flight future so
+# a burst of the same dashboard question hits the LLM/DB exactly once
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+async def singleflight(key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run `work` unless an identical call is already in flight, in which
+    case await and share its result.
+    """
+    existing = _inflight.get(key)
+    if existing is not None:
+        return await existing
+
+    future: asyncio.Future = asyncio.get_event_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await work()
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved in case no one else is waiting
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+def classify_error(error_msg: str) -> Optional[str]:
+    """
+    Classify an upstream error message into a known kind
+
+    Returns:
+        One of 'all_failed', 'unavailable', 'timeout', 'network', 'column',
+        or None for unrecognized errors
+    """
+    kinds = {m.lastgroup for m in _ERROR_RE.finditer(error_msg)}
+    if not kinds:
+        return None
+    for kind in _ERROR_KIND_PRIORITY:
+        if kind in kinds:
+            return kind
+    return None
+
+
+@dataclass
+class SqlGenResult:
+    """Outcome of generate_with_retry"""
+    success: bool
+    sql: Optional[str] = None
+    explanation: Optional[str] = None
+    confidence: Optional[float] = None
+    source: str = "legacy"
+    raw_result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ExecResult:
+    """Outcome of execute_with_retry"""
+    success: bool
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    truncated: bool = False
+    sql: Optional[str] = None
+    explanation: Optional[str] = None
+    confidence: Optional[float] = None
+    error: Optional[str] = None
+
+
+async def generate_with_retry(
+    query: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    max_retries: int = 2
+) -> SqlGenResult:
+    """
+    Generate SQL from natural language, retrying on transient generator errors
+
+    Non-retryable upstream failures (service unavailable, timeout, network)
+    abort immediately with user-friendly error copy. Concurrent calls for
+    the same query (without per-session history) share one in-flight
+    generation instead of each hitting the LLM.
+    """
+    if conversation_history:
+        # History-aware generations are session-specific; don't share them
+        return await _generate_with_retry(query, conversation_history, max_retries)
+
+    key = "gen:" + " ".join(query.lower().split())
+    return await singleflight(
+        key, lambda: _generate_with_retry(query, conversation_history, max_retries)
+    )
+
+
+async def _generate_with_retry(
+    query: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    max_retries: int = 2
+) -> SqlGenResult:
+    """Retry loop behind generate_with_retry"""
+    last_error = None
+
+    for attempt in range(max_retries + 1):
+        # On retry, include the error in the query context
+        query_with_context = query
+        if attempt > 0 and last_error:
+            query_with_context = _RETRY_SQL_TMPL.format(query=query, err=last_error)
+
+        try:
+            result = await sql_generator.generate_sql(
+                natural_language_query=query_with_context,
+                conversation_history=conversation_history
+            )
+            return SqlGenResult(
+                success=True,
+                sql=result["sql"],
+                explanation=result["explanation"],
+                confidence=result["confidence"],
+                source=result.get("source", "legacy"),
+                raw_result=result
+            )
+
+        except Exception as e:
+            last_error = str(e)
+            kind = _EXCEPTION_KINDS.get(type(e)) or classify_error(last_error)
+
+            if kind in _NON_RETRYABLE_KINDS:
+                return SqlGenResult(
+                    success=False,
+                    error=f"Failed to generate SQL query: {_USER_FACING_ERRORS[kind]}"
+                )
+
+            # For other errors, continue to retry if attempts remain
+            if attempt == max_retries:
+                return SqlGenResult(
+                    success=False,
+                    error=f"Failed to generate SQL query: {last_error}"
+                )
+
+    return SqlGenResult(success=False, error=f"Failed to generate SQL query: {last_error}")
+
+
+async def execute_with_retry(
+    sql: str,
+    query: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    explanation: Optional[str] = None,
+    confidence: Optional[float] = None,
+    row_limit: int = 2000,
+    max_retries: int = 2
+) -> ExecResult:
+    """
+    Execute generated SQL, regenerating once with error context on column errors
+
+    Results are streamed with a server-side cursor capped at row_limit, and
+    identical SQL re-executed within the cache TTL is served from memory.
+    Concurrent executions of the same SQL share one in-flight run.
+    Returns the final SQL/explanation/confidence, which may differ from the
+    inputs if a regeneration happened.
+    """
+    key = f"exec:{row_limit}:{sql}"
+    return await singleflight(
+        key,
+        lambda: _execute_with_retry(
+            sql, query, conversation_history, explanation, confidence,
+            row_limit, max_retries
+        )
+    )
+
+
+async def _execute_with_retry(
+    sql: str,
+    query: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    explanation: Optional[str] = None,
+    confidence: Optional[float] = None,
+    row_limit: int = 2000,
+    max_retries: int = 2
+) -> ExecResult:
+    """Retry loop behind execute_with_retry"""
+    current_sql = sql
+    current_explanation = explanation
+    current_confidence = confidence
+    execution_error = None
+
+    for attempt in range(max_retries + 1):
+        try:
+            rows = await sql_cache.lookup_results(current_sql)
+            truncated = False
+            if rows is None:
+                rows, truncated = await database_service.execute_query_streaming(current_sql, row_limit)
+                if not truncated:
+                    await sql_cache.store_results(current_sql, rows)
+
+            return ExecResult(
+                success=True,
+                rows=rows,
+                truncated=truncated,
+                sql=current_sql,
+                explanation=current_explanation,
+                confidence=current_confidence
+            )
+
+        except Exception as e:
+            execution_error = str(e)
+
+            # Column errors get one shot at regeneration with error context
+            if classify_error(execution_error) == "column" and attempt < max_retries:
+                try:
+                    regenerated = await sql_generator.generate_sql(
+                        natural_language_query=_COLUMN_ERR_TMPL.format(
+                            query=query, err=execution_error, sql=current_sql
+                        ),
+                        conversation_history=conversation_history
+                    )
+                    current_sql = regenerated["sql"]
+                    current_explanation = regenerated["explanation"]
+                    current_confidence = regenerated["confidence"] * 0.9  # Slightly lower confidence after retry
+                    continue  # Retry execution with new SQL
+
+                except Exception:
+                    # If retry generation fails, return original error
+                    break
+            else:
+                # Not a retryable error or out of retries
+                break
+
+    return ExecResult(
+        success=False,
+        sql=current_sql,
+        explanation=current_explanation,
+        confidence=current_confidence,
+        error=execution_error
+    )
@@ -3,6 +3,7 @@ Phase 4: SQL Rewriter
 Soft correction rules that auto-fix safe errors
 """
 
+from functools import lru_cache
 import re
 from typing import Tuple, Optional
 
@@ -10,17 +11,27 @@ from typing import Tuple, Optional
 class SQLRewriter:
     """
     Rewrites SQL queries to fix safe errors.
-    
+
     Rewrites:
     - GROUP BY diagnoses.id → GROUP BY diagnoses.name
     - Missing DISTINCT claims.id in counts
     - Ordering by alias not in SELECT
+    - Missing LIMIT (row cap pushed into the database)
     """
-    
+
+    # Hard row cap appended when the generated SQL has no LIMIT; matches the
+    # analysis cap in the API layer so the database stops producing rows the
+    # service would discard anyway
+    DEFAULT_ROW_LIMIT = 2000
+
+    @lru_cache(maxsize=4096)
     def rewrite(self, sql: str, query: str) -> Tuple[str, bool, Optional[str]]:
         """
         Rewrite SQL query to fix safe errors.
-        
+
+        The rewrite is a pure function of (sql, query), so results are
+        memoized; cached SQL generations skip the regex passes entirely.
+
         Args:
             sql: Original SQL query
             query: Original natural language query
@@ -183,6 +194,14 @@ class SQLRewriter:
                             # Just log that it might be an issue
                             pass
         
+        # REWRITE 4: Cap unbounded result sets with a hard LIMIT so the
+        # database stops early instead of materializing the full set
+        # server-side (the API layer truncates past DEFAULT_ROW_LIMIT anyway).
+        # The +1 sentinel row lets the caller detect that the set was capped.
+        if 'LIMIT' not in sql_upper:
+            sql = f"{sql.rstrip().rstrip(';')} LIMIT {self.DEFAULT_ROW_LIMIT + 1}"
+            rewritten = True
+
         # Validate that rewrite is safe
         if rewritten:
             # Check that rewritten SQL is still valid
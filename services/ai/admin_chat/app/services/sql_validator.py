@@ -3,6 +3,7 @@ Phase 4: SQL Validator
 Strict validation rules that reject queries immediately (HARD FAIL)
 """
 
+from functools import lru_cache
 import re
 from typing import Tuple, Optional
 
@@ -42,10 +43,14 @@ class SQLValidator:
         r'\bGROUP\s+BY\s+[^,]*\bservice_summary_id\b',
     ]
     
+    @lru_cache(maxsize=4096)
     def validate(self, sql: str, query: str, domain: str = 'clinical_claims_diagnosis') -> Tuple[bool, Optional[str]]:
         """
         Validate SQL query against strict rules.
-        
+
+        Validation is deterministic over (sql, query, domain), so results
+        are memoized; repeats from the generation cache skip the rule scan.
+
         Args:
             sql: Generated SQL query
             query: Original natural language query
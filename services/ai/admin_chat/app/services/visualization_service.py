@@ -5,10 +5,12 @@ Supports:
 - Chart image generation (PNG/SVG)
 - Enhanced metadata (axis labels, colors, chart settings)
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass
+import hashlib
 import json
-import base64
 import io
+import time
 from datetime import datetime
 
 # Optional imports for chart generation
@@ -29,6 +31,14 @@ except ImportError:
     PLOTLY_AVAILABLE = False
 
 
+@dataclass
+class VizBundle:
+    """Fused output of data analysis, table formatting, and summary generation"""
+    visualization: Dict[str, Any]
+    table: Dict[str, Any]
+    summary: str
+
+
 class VisualizationService:
     """Generates visualizations, chart configs, and images from SQL query results"""
     
@@ -39,7 +49,44 @@ class VisualizationService:
         'green': ['#065F46', '#10B981', '#34D399', '#6EE7B7', '#A7F3D0'],
         'warm': ['#DC2626', '#EA580C', '#F59E0B', '#EAB308', '#84CC16'],
     }
-    
+
+    # Rendered PNGs are served by URL instead of being base64-embedded in
+    # the JSON payload; bytes are kept in-process keyed by content hash
+    CHART_TTL_SECONDS = 3600
+    CHART_URL_PREFIX = "/api/v1/admin/chart"
+
+    def __init__(self):
+        self._chart_store: Dict[str, Tuple[bytes, float]] = {}
+
+    def _store_chart(self, png_bytes: bytes) -> str:
+        """Store PNG bytes under a content-hash id and return the id"""
+        chart_id = hashlib.sha256(png_bytes).hexdigest()[:16]
+        now = time.time()
+        # Drop expired entries while we're here
+        expired = [cid for cid, (_, ts) in self._chart_store.items()
+                   if now - ts > self.CHART_TTL_SECONDS]
+        for cid in expired:
+            del self._chart_store[cid]
+        self._chart_store[chart_id] = (png_bytes, now)
+        return chart_id
+
+    def get_chart_image(self, chart_id: str) -> Optional[bytes]:
+        """
+        Fetch stored PNG bytes by chart id
+
+        Returns:
+            PNG bytes, or None if the id is unknown or expired
+        """
+        entry = self._chart_store.get(chart_id)
+        if not entry:
+            return None
+        png_bytes, stored_at = entry
+        if time.time() - stored_at > self.CHART_TTL_SECONDS:
+            del self._chart_store[chart_id]
+            return None
+        return png_bytes
+
+
     def analyze_data(self, data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Analyze query results and suggest appropriate visualization
@@ -303,7 +350,7 @@ class VisualizationService:
             return {
                 "available": False,
                 "format": None,
-                "data": None
+                "url": None
             }
         
         try:
@@ -333,17 +380,17 @@ class VisualizationService:
                 plt.grid(axis='y', alpha=0.3, linestyle='--')
                 plt.tight_layout()
                 
-                # Save to bytes
+                # Save to bytes and serve by URL (no base64 in the payload)
                 img_buffer = io.BytesIO()
                 plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
                 img_buffer.seek(0)
-                img_base64 = base64.b64encode(img_buffer.read()).decode('utf-8')
+                chart_id = self._store_chart(img_buffer.read())
                 plt.close()
-                
+
                 return {
                     "available": True,
                     "format": "png",
-                    "data": f"data:image/png;base64,{img_base64}",
+                    "url": f"{self.CHART_URL_PREFIX}/{chart_id}",
                     "width": 1000,
                     "height": 600
                 }
@@ -373,17 +420,17 @@ class VisualizationService:
                 plt.grid(axis='y', alpha=0.3, linestyle='--')
                 plt.tight_layout()
                 
-                # Save to bytes
+                # Save to bytes and serve by URL (no base64 in the payload)
                 img_buffer = io.BytesIO()
                 plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
                 img_buffer.seek(0)
-                img_base64 = base64.b64encode(img_buffer.read()).decode('utf-8')
+                chart_id = self._store_chart(img_buffer.read())
                 plt.close()
-                
+
                 return {
                     "available": True,
                     "format": "png",
-                    "data": f"data:image/png;base64,{img_base64}",
+                    "url": f"{self.CHART_URL_PREFIX}/{chart_id}",
                     "width": 1200,
                     "height": 600
                 }
@@ -392,14 +439,14 @@ class VisualizationService:
             return {
                 "available": False,
                 "format": None,
-                "data": None,
+                "url": None,
                 "error": str(e)
             }
         
         return {
             "available": False,
             "format": None,
-            "data": None
+            "url": None
         }
     
     def _generate_metadata(
@@ -609,9 +656,131 @@ class VisualizationService:
             summary += "All results are shown below."
         else:
             summary += f"Showing first {len(sample)} of {num_rows} results."
-        
+
         return summary
 
+    def build_visualization_bundle(
+        self,
+        data: List[Dict[str, Any]],
+        query_explanation: str = "",
+        max_rows: int = 100,
+        include_table: bool = True
+    ) -> VizBundle:
+        """
+        Build analysis, formatted table, and summary in a single pass over the rows
+
+        Equivalent to calling analyze_data + format_table + generate_summary,
+        but walks the result set once instead of three times, which matters
+        on large result sets.
+
+        Args:
+            data: Query results
+            query_explanation: Explanation of what the query does
+            max_rows: Maximum rows to include in the formatted table
+            include_table: When False, skip row formatting entirely for
+                clients that only want the summary/visualization
+
+        Returns:
+            VizBundle with visualization dict, table dict, and summary text
+        """
+        if not data:
+            return VizBundle(
+                visualization=self.analyze_data(data),
+                table=self.format_table(data, max_rows=max_rows) if include_table else {},
+                summary=f"The query returned no results. {query_explanation}"
+            )
+
+        columns = list(data[0].keys())
+        total_rows = len(data)
+
+        # Single pass: classify columns and format table rows together
+        numeric_cols = []
+        categorical_cols = []
+        classified = {}  # col -> True (numeric) / False (categorical)
+        formatted_rows = []
+
+        for i, row in enumerate(data):
+            # Classify each column from its first non-None value
+            if len(classified) < len(columns):
+                for col in columns:
+                    if col in classified:
+                        continue
+                    value = row.get(col)
+                    if value is None:
+                        continue
+                    try:
+                        float(value)
+                        classified[col] = True
+                    except (ValueError, TypeError):
+                        classified[col] = False
+
+            # Format table rows during the same iteration
+            if include_table and i < max_rows:
+                formatted_row = {}
+                for col in columns:
+                    value = row.get(col)
+                    if value is None:
+                        formatted_row[col] = None
+                    elif isinstance(value, (int, float)):
+                        formatted_row[col] = value
+                    else:
+                        formatted_row[col] = str(value)
+                formatted_rows.append(formatted_row)
+
+        for col in columns:
+            # Columns that never had a non-None value are categorical
+            if classified.get(col, False):
+                numeric_cols.append(col)
+            else:
+                categorical_cols.append(col)
+
+        # Determine best visualization type (same rules as analyze_data)
+        num_cols = len(columns)
+        if total_rows == 1:
+            viz_type = "metrics"
+        elif num_cols == 2 and len(numeric_cols) == 1:
+            viz_type = "bar_chart"
+        elif num_cols >= 2 and len(numeric_cols) >= 1:
+            viz_type = "table_with_chart"
+        elif total_rows <= 20:
+            viz_type = "table"
+        else:
+            viz_type = "paginated_table"
+
+        visualization = {
+            "type": viz_type,
+            "row_count": total_rows,
+            "columns": columns,
+            "numeric_columns": numeric_cols,
+            "categorical_columns": categorical_cols,
+            "data": data,
+            "suggestions": self._get_viz_suggestions(viz_type, columns, numeric_cols),
+            "chart_config": self._generate_chart_configs(data, viz_type, columns, numeric_cols, categorical_cols),
+            "chart_image": self._generate_chart_image(data, viz_type, columns, numeric_cols, categorical_cols),
+            "metadata": self._generate_metadata(data, viz_type, columns, numeric_cols, categorical_cols)
+        }
+
+        table = {}
+        if include_table:
+            table = {
+                "rows": formatted_rows,
+                "columns": columns,
+                "total_rows": total_rows,
+                "page": 1,
+                "page_size": max_rows,
+                "has_more": total_rows > max_rows,
+                "display_count": len(formatted_rows)
+            }
+
+        summary = f"Query returned {total_rows} result{'s' if total_rows != 1 else ''}. "
+        summary += f"{query_explanation}\n\n"
+        if total_rows <= 10:
+            summary += "All results are shown below."
+        else:
+            summary += f"Showing first {min(5, total_rows)} of {total_rows} results."
+
+        return VizBundle(visualization=visualization, table=table, summary=summary)
+
 
 # Global instance
 visualization_service = VisualizationService()
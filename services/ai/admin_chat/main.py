@@ -5,8 +5,10 @@ Natural language to SQL analytics for internal staff
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import anyio
 import uvicorn
 
+from app.api.v1.admin import AdminORJSONResponse
 from app.core.config import settings
 from app.services.database_service import database_service
 from app.services.schema_mapper import schema_mapper
@@ -31,6 +33,9 @@ async def lifespan(app: FastAPI):
     print(f"   Host: {settings.HOST}")
     print(f"   Port: {settings.PORT}")
     
+    # Size the default threadpool for offloaded CPU-bound visualization work
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 64
+
     # Initialize database connection
     print("📊 Initializing database connection...")
     await database_service.initialize()
@@ -83,7 +88,8 @@ app = FastAPI(
     title="Hiva Admin Chat API",
     description="Natural language to SQL analytics for internal staff",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=AdminORJSONResponse
 )
 
 # CORS middleware